@@ -1,33 +1,139 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_cors import CORS
-from dotenv import load_dotenv
 import jwt
 import os
 import logging
-import bcrypt
+import queue
+import base64
+import hashlib
+from collections import namedtuple
 from functools import wraps
-logging.basicConfig(level=logging.DEBUG)
+from sqlalchemy import delete, event, func, insert, literal, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import declared_attr
+from sqlalchemy.pool import QueuePool
+from cache import TTLCache
+from config import get_config
+from hashing import PasswordHasher, PoolSaturated
+from json_provider import FastJSONProvider
+from metrics import Metrics
+from profiling import RequestProfiler
+from pubsub import InvalidationBus, PubSub, Subscribers
+from query_stats import QueryCounter
+from slow_queries import SlowQueryLog
+from shared_cache import SharedResponseCache
+
+db = SQLAlchemy()
+api = Blueprint('api', __name__)
+password_hasher = PasswordHasher()
+pubsub = PubSub()
+query_counter = QueryCounter()
+slow_query_log = SlowQueryLog()
+profiler = RequestProfiler()
+
+# SSE subscribers to comment changes, keyed by project id. Every worker's
+# LISTEN connection feeds its own subscribers from the shared channel.
+COMMENT_EVENTS_CHANNEL = 'comment_events'
+comment_subscribers = Subscribers()
+
+
+def hash_pool_saturated():
+    return jsonify({"error": "Server busy, please retry"}), 503, {"Retry-After": str(current_app.config['HASH_POOL_RETRY_AFTER'])}
+
+# Verified identities, keyed by user id.
+Identity = namedtuple('Identity', ['id', 'username'])
+identity_cache = TTLCache()
+
+# (etag, body) for GET /projects/<id>, the hottest read. Misses for the same id
+# are coalesced into one query.
+project_cache = TTLCache()
+
+# Encoded GET /projects pages and GET /users/<id> bodies, shared by all workers
+# on the node. Project pages carry the 'projects' generation, which any project
+# write bumps; a user's body carries the 'users' generation and its own one,
+# user_namespace(id), so a write to one user leaves the others cached.
+shared_cache = SharedResponseCache()
+
+# Every write logged through record_change/record_deletes touches its entity key,
+# and on commit the bus invalidates the matching entries in every worker's caches.
+# A user rename also touches all projects, since each embeds its author's username.
+invalidation_bus = InvalidationBus(pubsub)
+
+
+def user_namespace(user_id):
+    return f'users:{user_id}'
+
+
+def invalidate(cache):
+    return lambda key: cache.clear() if key is None else cache.invalidate(key)
+
+
+invalidation_bus.on('user', invalidate(identity_cache))
+invalidation_bus.on('project', invalidate(project_cache))
+invalidation_bus.on('user', lambda key: shared_cache.bump('users' if key is None else user_namespace(key)))
+invalidation_bus.on('project', lambda key: shared_cache.bump('projects'))
+
+metrics = Metrics()
+metrics.describe('db_pool_connections', 'gauge', 'Pooled connections by state; overflow counts those opened past pool_size.')
+metrics.describe('password_hash_pool_limit', 'gauge', 'Password hashing threads (workers) and hashes admitted at once (capacity).')
+metrics.describe('password_hash_pool_tasks', 'gauge', 'Password hashes running or waiting for a thread.')
+metrics.describe('password_hash_rejected_total', 'counter', 'Password hashes refused because the pool was saturated.')
+metrics.describe('cache_hits_total', 'counter', 'Cache lookups that found a live entry.')
+metrics.describe('cache_misses_total', 'counter', 'Cache lookups that did not.')
+metrics.describe('cache_entries', 'gauge', 'Entries held by each in-process cache.')
+
+
+def collect_pool_metrics():
+    pool = db.engine.pool
+    if not isinstance(pool, QueuePool):
+        return []
+    return [
+        ('db_pool_connections', {'state': 'size'}, pool.size()),
+        ('db_pool_connections', {'state': 'checked_out'}, pool.checkedout()),
+        ('db_pool_connections', {'state': 'checked_in'}, pool.checkedin()),
+        ('db_pool_connections', {'state': 'overflow'}, max(pool.overflow(), 0)),
+    ]
+
+
+def collect_hash_pool_metrics():
+    stats = password_hasher.stats()
+    return [
+        ('password_hash_pool_limit', {'kind': 'workers'}, stats['workers']),
+        ('password_hash_pool_limit', {'kind': 'capacity'}, stats['capacity']),
+        ('password_hash_pool_tasks', {'state': 'active'}, stats['active']),
+        ('password_hash_pool_tasks', {'state': 'queued'}, stats['queued']),
+        ('password_hash_rejected_total', {}, stats['rejected_total']),
+    ]
+
+
+def collect_cache_metrics():
+    samples = []
+    for name, cache in (('identity', identity_cache), ('project', project_cache), ('shared_response', shared_cache)):
+        stats = cache.stats()
+        samples.append(('cache_hits_total', {'cache': name}, stats['hits']))
+        samples.append(('cache_misses_total', {'cache': name}, stats['misses']))
+        if 'size' in stats:
+            samples.append(('cache_entries', {'cache': name}, stats['size']))
+    return samples
+
+
+metrics.add_collector(collect_pool_metrics)
+metrics.add_collector(collect_hash_pool_metrics)
+metrics.add_collector(collect_cache_metrics)
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
-load_dotenv()
-
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL').replace("postgres://", "postgresql://", 1)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET')
-app.config['SQLALCHEMY_ECHO'] = True
-frontend_url = os.getenv('FRONTEND_URL', '*') 
-
-CORS(app, resources={r"/*": {
-    "origins": frontend_url,
-    "supports_credentials": True,
-    "methods": ["GET", "POST", "PUT", "DELETE"],  
-    "allow_headers": ["Content-Type", "Authorization"] 
-}})
 
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+def load_identity(user_id):
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        user = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+        if not user:
+            return None
+        identity = Identity(*user)
+        identity_cache.set(user_id, identity)
+    return identity
+
 
 def token_required(f):
     @wraps(f)
@@ -38,7 +144,11 @@ def token_required(f):
         try:
             token = token.split(" ")[1]
             decoded_token = jwt.decode(token, os.getenv('JWT_SECRET'), algorithms=["HS256"])
-            current_user = User.query.get(decoded_token['id'])
+            if current_app.config['TRUST_TOKEN_CLAIMS'] and request.method in READ_ONLY_METHODS:
+                # the signature is enough for reads; skip the existence check entirely
+                current_user = Identity(decoded_token['id'], decoded_token.get('username'))
+            else:
+                current_user = load_identity(decoded_token['id'])
             if not current_user:
                 return jsonify({'error': 'User not found!'}), 404
         except Exception as e:
@@ -47,14 +157,255 @@ def token_required(f):
     return wrap
 
 
-class User(db.Model):
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(padded.encode('utf-8')).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def page_limit():
+    """The `limit` query arg clamped to 1..MAX_PAGE_SIZE; ValueError if it is not a number."""
+    limit = request.args.get('limit', current_app.config['DEFAULT_PAGE_SIZE'])
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('Invalid limit')
+    return max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+
+
+def decode_change_cursor(cursor):
+    """(txid, id) from a GET /changes cursor; cursors issued before txids were logged hold just an id."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        txid, _, last_id = base64.urlsafe_b64decode(padded.encode('utf-8')).decode('utf-8').rpartition(':')
+        return int(txid or 0), int(last_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def paginate(query, id_column):
+    """Keyset-paginate `query` on `id_column` using the `limit` and `after` query args.
+
+    Returns the rows for the page and the cursor for the next one, or None on the last page.
+    Raises ValueError for a malformed cursor or limit.
+    """
+    limit = page_limit()
+
+    after = request.args.get('after')
+    if after:
+        query = query.filter(id_column > decode_cursor(after))
+
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+
+def row_to_dict(row):
+    return row._asdict()
+
+
+def wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true')
+
+
+def stream_rows(query, id_column, serialize):
+    """Stream every row of `query` after the optional `after` cursor, in id order.
+
+    Rows are fetched `STREAM_YIELD_PER` at a time (a server-side cursor on
+    PostgreSQL) and each batch is encoded and written before the next is
+    read, so memory stays flat regardless of the result size. The body is
+    NDJSON when the client accepts application/x-ndjson, otherwise a JSON array.
+    Raises ValueError for a malformed cursor.
+    """
+    after = request.args.get('after')
+    if after:
+        query = query.filter(id_column > decode_cursor(after))
+    batch_size = current_app.config['STREAM_YIELD_PER']
+    rows = query.order_by(id_column).yield_per(batch_size)
+    ndjson = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+    dumps = current_app.json.dumps
+
+    def generate():
+        chunk = []
+        if not ndjson:
+            chunk.append('[')
+        for count, row in enumerate(rows):
+            if ndjson:
+                chunk.append(dumps(serialize(row)) + '\n')
+            else:
+                chunk.append((',' if count else '') + dumps(serialize(row)))
+            if len(chunk) >= batch_size:
+                yield ''.join(chunk)
+                chunk = []
+        if not ndjson:
+            chunk.append(']')
+        yield ''.join(chunk)
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def rows_etag(rows, *extra):
+    """Strong ETag over the raw column values of `rows`, computed without serializing them."""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in rows:
+        digest.update(repr(tuple(row)).encode('utf-8'))
+    digest.update(repr(extra).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def conditional_response(etag, build, cache_control):
+    """Return 304 if the client already holds `etag`, otherwise jsonify(build()).
+
+    `build` is only called on a miss, so an unchanged resource is never serialized.
+    It may also return a ready response, such as one holding pre-encoded bytes.
+    If-None-Match is compared weakly (RFC 9110 13.1.2), so the W/ a compressing
+    proxy puts on our ETag still matches.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = build()
+        response = body if isinstance(body, Response) else jsonify(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = current_app.config[cache_control]
+    return response
+
+
+def shared_response(namespaces, key, build, cache_control):
+    """Serve `build()` through shared_cache under the current generations of `namespaces`.
+
+    The key carries one generation per namespace, so bumping any of them
+    orphans the entry. Only 200 responses with an ETag are stored, as
+    encoded bytes; a hit is answered, or 304'd, without touching the database.
+    """
+    if not shared_cache.enabled:
+        return build()
+    generations = ':'.join(str(shared_cache.generation(namespace)) for namespace in namespaces)
+    key = f'{namespaces[0]}:{generations}:{key}'
+    cached = shared_cache.get(key)
+    if cached is not None:
+        etag, body = cached
+        return conditional_response(etag, lambda: current_app.response_class(body, mimetype='application/json'), cache_control)
+    response = build()
+    if isinstance(response, Response) and response.status_code == 200 and not response.is_streamed:
+        etag, _ = response.get_etag()
+        if etag:
+            shared_cache.set(key, etag, response.get_data())
+    return response
+
+
+def list_response(query, id_column, serialize=row_to_dict):
+    if wants_stream():
+        return stream_rows(query, id_column, serialize)
+    rows, next_cursor = paginate(query, id_column)
+    return conditional_response(
+        rows_etag(rows, next_cursor),
+        lambda: {"items": [serialize(row) for row in rows], "next_cursor": next_cursor},
+        'LIST_CACHE_CONTROL'
+    )
+
+
+def patch_row(model, row_id, data, required, optional, returning, ignore_unknown=False, computed=None):
+    """Apply `data` to one row with a single UPDATE ... WHERE id = :id RETURNING ...
+
+    `required` fields must be non-empty strings, `optional` ones strings or null;
+    any other key raises ValueError, or with `ignore_unknown` is dropped, so a
+    PUT can send back an object as it was read (id, user_id, username...).
+    `computed` holds columns the server derived itself, such as a password
+    hash; they are written as given and never taken from `data`.
+    Returns the updated row, or None if no row has that id. The caller commits.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("No fields to update")
+    computed = computed or {}
+    unknown = set(data) - set(required) - set(optional)
+    if ignore_unknown:
+        data = {field: value for field, value in data.items() if field not in unknown}
+        if not data and not computed:
+            # nothing writable was sent; like before, leave the row as it is
+            return db.session.execute(select(*returning).where(model.id == row_id)).first()
+    elif not data and not computed:
+        raise ValueError("No fields to update")
+    elif unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    for field, value in data.items():
+        if field in required and not (isinstance(value, str) and value):
+            raise ValueError(f"Field '{field}' must be a non-empty string")
+        if field in optional and value is not None and not isinstance(value, str):
+            raise ValueError(f"Field '{field}' must be a string or null")
+
+    row = db.session.execute(
+        update(model).where(model.id == row_id)
+        .values(version=model.version + 1, **data, **computed)
+        .returning(*returning)
+    ).first()
+    if row:
+        record_change(model.__tablename__, row_id, ChangeLog.UPSERT)
+    return row
+
+
+def current_txid():
+    """The writing transaction's id on PostgreSQL, which orders GET /changes; 0 elsewhere."""
+    return func.txid_current() if db.engine.dialect.name == 'postgresql' else literal(0)
+
+
+def record_change(entity, entity_id, op):
+    """Append a change to the log in the current transaction; commit it with the write itself."""
+    db.session.execute(insert(ChangeLog).values(entity=entity, entity_id=entity_id, op=op, txid=current_txid()))
+    invalidation_bus.touch(db.session, entity, entity_id)
+
+
+def record_deletes(entity, id_column, *criteria):
+    """Log a tombstone for every `entity` row matching `criteria` with one INSERT ... SELECT.
+
+    Must run before the DELETE that removes them, since ON DELETE CASCADE
+    children are gone afterwards.
+    """
+    rows = select(literal(entity), id_column, literal(ChangeLog.DELETE), current_txid()).where(*criteria)
+    db.session.execute(insert(ChangeLog).from_select(['entity', 'entity_id', 'op', 'txid'], rows))
+    invalidation_bus.touch(db.session, entity)
+
+
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+class Timestamped:
+    """created_at/updated_at timestamps and a row version bumped on every update.
+
+    ORM flushes bump `version` through version_id_col; Core UPDATEs (see
+    patch_row) must set `version = version + 1` themselves.
+    """
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now(), index=True)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now(), onupdate=db.func.now(), index=True)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {'version_id_col': cls.__table__.c.version}
+
+
+class User(Timestamped, db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    projects = db.relationship('Project', back_populates='user', cascade="all, delete-orphan")
-    comments = db.relationship('Comment', back_populates='user', cascade="all, delete-orphan")
+    projects = db.relationship('Project', back_populates='user', cascade="all, delete-orphan", passive_deletes=True)
+    comments = db.relationship('Comment', back_populates='user', cascade="all, delete-orphan", passive_deletes=True)
     twitter = db.Column(db.String(120), nullable=True)
     linkedin = db.Column(db.String(120), nullable=True)
     youtube = db.Column(db.String(120), nullable=True)
@@ -64,29 +415,59 @@ class User(db.Model):
         return f'<User {self.username}>'
 
 
-class Project(db.Model):
+class Project(Timestamped, db.Model):
     __tablename__ = 'project'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.String, nullable=True)
     image_url = db.Column(db.String(500), nullable=True)
     deployed_url = db.Column(db.String(500), nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     user = db.relationship('User', back_populates='projects')
-    comments = db.relationship('Comment', back_populates='project', cascade="all, delete-orphan")
+    comments = db.relationship('Comment', back_populates='project', cascade="all, delete-orphan", passive_deletes=True)
 
 
 
-class Comment(db.Model):
+class Comment(Timestamped, db.Model):
     __tablename__ = 'comment'
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False, index=True)
     user = db.relationship('User', back_populates='comments')
     project = db.relationship('Project', back_populates='comments')
 
-@app.route('/sign-token', methods=['GET'])
+class ChangeLog(db.Model):
+    """Append-only log of writes, read by GET /changes in (txid, id) order.
+
+    txid is the id of the transaction that wrote the entry (txid_current() on
+    PostgreSQL, 0 on SQLite, whose writers are serialized anyway).
+    """
+    __tablename__ = 'change_log'
+    __table_args__ = (db.Index('ix_change_log_txid_id', 'txid', 'id'),)
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    txid = db.Column(db.BigInteger, nullable=False, server_default='0')
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, server_default=db.func.now())
+
+
+# Column projections for the read routes. Selecting only what each route emits
+# keeps description text and unused columns off the wire and skips ORM entity
+# hydration; the resulting rows serialize with row._asdict().
+USER_SUMMARY_COLUMNS = (User.id, User.username, User.email)
+USER_COLUMNS = USER_SUMMARY_COLUMNS + (User.twitter, User.linkedin, User.youtube, User.github, User.profile_picture)
+PROJECT_COLUMNS = (Project.id, Project.title, Project.description, Project.image_url, Project.deployed_url, Project.user_id)
+PROJECT_WITH_AUTHOR_COLUMNS = PROJECT_COLUMNS + (User.username,)
+USER_PROJECT_COLUMNS = (Project.id, Project.title, Project.description, Project.image_url, Project.user_id)
+COMMENT_COLUMNS = (Comment.id, Comment.content, Comment.user_id, Comment.project_id)
+
+
+@api.route('/sign-token', methods=['GET'])
 def sign_token():
     user = {
         "id": 1,
@@ -96,7 +477,7 @@ def sign_token():
     token = jwt.encode(user, os.getenv('JWT_SECRET'), algorithm="HS256")
     return jsonify({"token": token})
 
-@app.route('/verify-token', methods=['POST'])
+@api.route('/verify-token', methods=['POST'])
 def verify_token():
     try:
         token = request.headers.get('Authorization').split(' ')[1]
@@ -105,69 +486,71 @@ def verify_token():
     except Exception as error:
         return jsonify({"error": str(error)})
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([{"id": user.id, "username": user.username, "email": user.email} for user in users]), 200
+    try:
+        return list_response(db.session.query(*USER_SUMMARY_COLUMNS), User.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-@app.route('/users/<int:user_id>', methods=['GET'])
+@api.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    user = User.query.get(user_id)
+    return shared_response(
+        ('users', user_namespace(user_id)), user_id, lambda: load_user_response(user_id), 'DETAIL_CACHE_CONTROL'
+    )
+
+
+def load_user_response(user_id):
+    user = db.session.query(*USER_COLUMNS).filter(User.id == user_id).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
-    user_data = {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "twitter": user.twitter,
-        "linkedin": user.linkedin,
-        "youtube": user.youtube,
-        "github": user.github,
-        "profile_picture": user.profile_picture  
-    }
-    return jsonify(user_data), 200
+    return conditional_response(rows_etag([user]), user._asdict, 'DETAIL_CACHE_CONTROL')
 
 
-@app.route('/signup', methods=['POST'])
+@api.route('/signup', methods=['POST'])
 def signup():
     try:
         data = request.json
 
         
-        if User.query.filter_by(username=data['username']).first():
+        if db.session.query(User.id).filter(User.username == data['username']).first():
             return jsonify({"error": "Username already exists"}), 400
 
-        if User.query.filter_by(email=data['email']).first():
+        if db.session.query(User.id).filter(User.email == data['email']).first():
             return jsonify({"error": "Email already exists"}), 400
 
         
-        hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+        hashed_password = password_hasher.hash(data['password'])
 
         user = User(
             username=data['username'],
             email=data['email'],
-            password_hash=hashed_password.decode('utf-8') 
+            password_hash=hashed_password
         )
         db.session.add(user)
+        db.session.flush()
+        record_change(User.__tablename__, user.id, ChangeLog.UPSERT)
         db.session.commit()
 
         return jsonify({"message": "User created successfully"}), 201
 
     except KeyError as e:
         return jsonify({"error": f"Missing field: {e}"}), 400
+    except PoolSaturated:
+        return hash_pool_saturated()
     except Exception as e:
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 
 
-@app.route('/signin', methods=['POST'])
+@api.route('/signin', methods=['POST'])
 def signin():
     try:
         data = request.json
-        user = User.query.filter_by(username=data['username']).first()
+        user = db.session.query(User.id, User.username, User.password_hash).filter(User.username == data['username']).first()
 
       
-        if not user or not bcrypt.checkpw(data['password'].encode('utf-8'), user.password_hash.encode('utf-8')):
+        if not user or not password_hasher.check(data['password'], user.password_hash):
             return jsonify({"error": "Invalid credentials"}), 401
         
        
@@ -175,123 +558,120 @@ def signin():
         
         return jsonify({"token": token, "id": user.id})
 
+    except PoolSaturated:
+        return hash_pool_saturated()
     except Exception as e:
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 
 
-@app.route('/users/<int:user_id>', methods=['PUT'])
+USER_REQUIRED_FIELDS = ('username', 'email')
+USER_OPTIONAL_FIELDS = ('twitter', 'linkedin', 'youtube', 'github', 'profile_picture')
+
+
+@api.route('/users/<int:user_id>', methods=['PUT', 'PATCH'])
 def update_user(user_id):
     try:
-        user = User.query.get(user_id)
+        data = dict(request.json or {})
+        computed = {}
+        if 'password' in data:
+            if not isinstance(data['password'], str) or not data['password']:
+                return jsonify({"error": "Field 'password' must be a non-empty string"}), 400
+            computed['password_hash'] = password_hasher.hash(data.pop('password'))
+
+        user = patch_row(
+            User, user_id, data,
+            required=USER_REQUIRED_FIELDS,
+            optional=USER_OPTIONAL_FIELDS,
+            returning=USER_COLUMNS,
+            ignore_unknown=request.method == 'PUT',
+            computed=computed
+        )
         if not user:
             return jsonify({"error": "User not found"}), 404
-
-        data = request.json
         if 'username' in data:
-            user.username = data['username']
-        if 'email' in data:
-            user.email = data['email']
-        if 'password' in data:
-            user.password_hash = data['password']
-        if hasattr(user, 'first_name') and 'first_name' in data:
-            user.first_name = data['first_name']
-        if hasattr(user, 'last_name') and 'last_name' in data:
-            user.last_name = data['last_name']
-        if hasattr(user, 'bio') and 'bio' in data:
-            user.bio = data['bio']
-        
-        if 'twitter' in data:
-            user.twitter = data['twitter']
-        if 'linkedin' in data:
-            user.linkedin = data['linkedin']
-        if 'youtube' in data:
-            user.youtube = data['youtube']
-        if 'github' in data:
-            user.github = data['github']
-        if 'profile_picture' in data:
-            user.profile_picture = data['profile_picture']
-
+            invalidation_bus.touch(db.session, Project.__tablename__)
         db.session.commit()
-        return jsonify({"message": "User updated successfully"}), 200
-
+        return jsonify({"message": "User updated successfully", "user": user._asdict()}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "Username or email already exists"}), 400
+    except PoolSaturated:
+        return hash_pool_saturated()
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 
-@app.route('/users/<int:user_id>', methods=['DELETE'])
+@api.route('/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
-    user = User.query.get(user_id)
-    if not user:
+    # projects and comments go with it through ON DELETE CASCADE, so their
+    # tombstones are written first
+    user_projects = select(Project.id).where(Project.user_id == user_id)
+    record_deletes(Comment.__tablename__, Comment.id, or_(Comment.user_id == user_id, Comment.project_id.in_(user_projects)))
+    record_deletes(Project.__tablename__, Project.id, Project.user_id == user_id)
+    result = db.session.execute(delete(User).where(User.id == user_id))
+    if not result.rowcount:
+        db.session.rollback()
         return jsonify({"error": "User not found"}), 404
-    db.session.delete(user)
+    record_change(User.__tablename__, user_id, ChangeLog.DELETE)
     db.session.commit()
     return jsonify({"message": "User deleted successfully"}), 200
 
-@app.route('/users/<int:user_id>/projects', methods=['GET'])
+@api.route('/users/<int:user_id>/projects', methods=['GET'])
 def get_user_projects(user_id):
     try:
-        user = User.query.get_or_404(user_id)
-        projects = Project.query.filter_by(user_id=user.id).all()
-        projects_list = [
-            {
-                "id": project.id,
-                "title": project.title,
-                "description": project.description,
-                "image_url": project.image_url,
-                "user_id": project.user_id
-            } for project in projects
-        ]
-        return jsonify(projects_list), 200
+        if not db.session.query(User.id).filter(User.id == user_id).first():
+            return jsonify({"error": "User not found"}), 404
+        projects = db.session.query(*USER_PROJECT_COLUMNS).filter(Project.user_id == user_id).all()
+        return conditional_response(
+            rows_etag(projects), lambda: [project._asdict() for project in projects], 'LIST_CACHE_CONTROL'
+        )
     except Exception as e:
-        app.logger.error('Error fetching user projects: %s', e)
+        current_app.logger.error('Error fetching user projects: %s', e)
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/projects', methods=['GET'])
+@api.route('/projects', methods=['GET'])
 def get_projects():
     try:
-        projects = Project.query.join(User).all()
-        project_list = [
-            {
-                "id": project.id,
-                "title": project.title,
-                "description": project.description,
-                "image_url": project.image_url,
-                "deployed_url": project.deployed_url,
-                "user_id": project.user_id,
-                "username": project.user.username 
-            }
-            for project in projects
-        ]
-        return jsonify(project_list), 200
+        return shared_response(
+            ('projects',), request.query_string.decode('utf-8'),
+            lambda: list_response(db.session.query(*PROJECT_WITH_AUTHOR_COLUMNS).join(Project.user), Project.id),
+            'LIST_CACHE_CONTROL'
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        app.logger.error('Error fetching projects: %s', e)
+        current_app.logger.error('Error fetching projects: %s', e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/projects/<int:id>', methods=['GET'])
+def load_project_detail(project_id):
+    project = db.session.query(*PROJECT_WITH_AUTHOR_COLUMNS).join(Project.user).filter(Project.id == project_id).first()
+    if not project:
+        return None
+    return rows_etag([project]), project._asdict()
+
+
+@api.route('/projects/<int:id>', methods=['GET'])
 def get_project(id):
     try:
-        project = Project.query.get_or_404(id)
-        project_data = {
-            "id": project.id,
-            "title": project.title,
-            "description": project.description,
-            "image_url": project.image_url,
-            "deployed_url": project.deployed_url,
-            "user_id": project.user_id,
-            "username": project.user.username 
-        }
-        return jsonify(project_data), 200
+        cached = project_cache.get_or_load(id, lambda: load_project_detail(id))
+        if not cached:
+            return jsonify({"error": "Project not found"}), 404
+        etag, project = cached
+        return conditional_response(etag, lambda: project, 'DETAIL_CACHE_CONTROL')
     except Exception as e:
-        app.logger.error('Error fetching project details: %s', e)
+        current_app.logger.error('Error fetching project details: %s', e)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/projects', methods=['POST'])
+@api.route('/projects', methods=['POST'])
 def create_project():
     try:
         data = request.json
-        app.logger.debug('Request data: %s', data)
         if not data.get('title') or not data.get('user_id'):
             return jsonify({"error": "Missing required fields: 'title' or 'user_id'"}), 400
         
@@ -303,56 +683,147 @@ def create_project():
             user_id=data['user_id']
         )
         db.session.add(project)
+        db.session.flush()
+        record_change(Project.__tablename__, project.id, ChangeLog.UPSERT)
         db.session.commit()
         return jsonify({"id": project.id, "title": project.title, "description": project.description, "image_url": project.image_url, "deployed_url": project.deployed_url, "user_id": project.user_id}), 201
     except Exception as e:
-        app.logger.error('Error: %s', e)
+        current_app.logger.error('Error: %s', e)
         return jsonify({"error": str(e)}), 500
 
 
     
-@app.route('/projects/<int:project_id>', methods=['PUT'])
+@api.route('/projects/<int:project_id>', methods=['PUT', 'PATCH'])
 def update_project(project_id):
     try:
-        project = Project.query.get(project_id)
+        project = patch_row(
+            Project, project_id, request.json,
+            required=('title',),
+            optional=('description', 'image_url', 'deployed_url'),
+            returning=PROJECT_COLUMNS,
+            ignore_unknown=request.method == 'PUT'
+        )
         if not project:
             return jsonify({"error": "Project not found"}), 404
-
-        data = request.json
-        if 'title' in data:
-            project.title = data['title']
-        if hasattr(project, 'description') and 'description' in data:
-            project.description = data['description']
-
         db.session.commit()
-        return jsonify({"message": "Project updated successfully"}), 200
+        return jsonify({"message": "Project updated successfully", "project": project._asdict()}), 200
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
 
-@app.route('/projects/<int:project_id>', methods=['DELETE'])
+@api.route('/projects/<int:project_id>', methods=['DELETE'])
 def delete_project(project_id):
-    project = Project.query.get(project_id)
-    if not project:
+    record_deletes(Comment.__tablename__, Comment.id, Comment.project_id == project_id)
+    result = db.session.execute(delete(Project).where(Project.id == project_id))
+    if not result.rowcount:
+        db.session.rollback()
         return jsonify({"error": "Project not found"}), 404
-    db.session.delete(project)
+    record_change(Project.__tablename__, project_id, ChangeLog.DELETE)
     db.session.commit()
     return jsonify({"message": "Project deleted successfully"}), 200
 
-@app.route('/comments', methods=['GET'])
+@api.route('/projects/<int:project_id>/comments', methods=['GET'])
+def get_project_comments(project_id):
+    if not db.session.query(Project.id).filter_by(id=project_id).first():
+        return jsonify({"error": "Project not found"}), 404
+
+    if request.args.get('embed') == 'user':
+        query = db.session.query(*COMMENT_COLUMNS, User.username).join(Comment.user)
+    else:
+        query = db.session.query(*COMMENT_COLUMNS)
+    try:
+        return list_response(query.filter(Comment.project_id == project_id), Comment.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def publish_comment_event(event_type, comment):
+    """Tell the project's SSE subscribers about a comment change once the transaction commits.
+
+    Only ids go out: NOTIFY payloads are capped at 8000 bytes and comment
+    content is unbounded. Each worker loads the row itself, see below.
+    """
+    pubsub.publish(db.session, COMMENT_EVENTS_CHANNEL, {
+        "type": event_type, "id": comment["id"], "project_id": comment["project_id"]
+    })
+
+
+def broadcast_comment_event(payload):
+    """Hand a committed comment event to this worker's subscribers, with the comment as it is now.
+
+    Runs once per worker, not per subscriber, and only if the project has any.
+    The row is read on its own connection, since this can run inside the
+    writer's after_commit. An upsert of a comment already deleted again is
+    skipped; its "deleted" event follows.
+    """
+    project_id = payload['project_id']
+    if not comment_subscribers.count(project_id):
+        return
+    if payload['type'] == 'deleted':
+        comment = {"id": payload['id'], "project_id": project_id}
+    else:
+        with db.engine.connect() as connection:
+            row = connection.execute(select(*COMMENT_COLUMNS).where(Comment.id == payload['id'])).first()
+        if row is None:
+            return
+        comment = row._asdict()
+    comment_subscribers.broadcast(project_id, {"type": payload['type'], "comment": comment})
+
+
+pubsub.add_handler(COMMENT_EVENTS_CHANNEL, broadcast_comment_event)
+
+
+@api.route('/projects/<int:project_id>/comments/stream', methods=['GET'])
+def stream_project_comments(project_id):
+    """Server-Sent Events feed of comments created, updated or deleted on one project.
+
+    The generator does not touch the database, so no connection is held for
+    the life of the stream. gunicorn.conf.py runs gevent workers, so each
+    open stream costs a greenlet rather than a whole worker.
+    """
+    if not db.session.query(Project.id).filter_by(id=project_id).first():
+        return jsonify({"error": "Project not found"}), 404
+
+    subscriber = comment_subscribers.subscribe(project_id)
+    keepalive = current_app.config['SSE_KEEPALIVE_SECONDS']
+    dumps = current_app.json.dumps
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    payload = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: {payload["type"]}\ndata: {dumps(payload["comment"])}\n\n'
+        finally:
+            comment_subscribers.unsubscribe(project_id, subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@api.route('/comments', methods=['GET'])
 def get_comments():
-    comments = Comment.query.all()
-    return jsonify([{"id": comment.id, "content": comment.content, "user_id": comment.user_id, "project_id": comment.project_id} for comment in comments]), 200
+    try:
+        return list_response(db.session.query(*COMMENT_COLUMNS), Comment.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-@app.route('/comments/<int:comment_id>', methods=['GET'])
+@api.route('/comments/<int:comment_id>', methods=['GET'])
 def get_comment(comment_id):
-    comment = Comment.query.get(comment_id)
+    comment = db.session.query(*COMMENT_COLUMNS).filter(Comment.id == comment_id).first()
     if not comment:
         return jsonify({"error": "Comment not found"}), 404
-    return jsonify({"id": comment.id, "content": comment.content, "user_id": comment.user_id, "project_id": comment.project_id}), 200
+    return conditional_response(rows_etag([comment]), comment._asdict, 'DETAIL_CACHE_CONTROL')
 
-@app.route('/comments', methods=['POST'])
+@api.route('/comments', methods=['POST'])
 def create_comment():
     try:
         data = request.json
@@ -365,30 +836,159 @@ def create_comment():
             project_id=data['project_id']
         )
         db.session.add(comment)
+        db.session.flush()
+        record_change(Comment.__tablename__, comment.id, ChangeLog.UPSERT)
+        comment_data = {"id": comment.id, "content": comment.content, "user_id": comment.user_id, "project_id": comment.project_id}
+        publish_comment_event('created', comment_data)
         db.session.commit()
-        return jsonify({"id": comment.id, "content": comment.content, "user_id": comment.user_id, "project_id": comment.project_id}), 201
+        return jsonify(comment_data), 201
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({"error": "Server error", "details": str(e)}), 500
 
-@app.route('/comments/<int:comment_id>', methods=['PUT'])
+@api.route('/comments/<int:comment_id>', methods=['PUT', 'PATCH'])
 def update_comment(comment_id):
-    comment = Comment.query.get(comment_id)
-    if not comment:
-        return jsonify({"error": "Comment not found"}), 404
-    data = request.json
-    comment.content = data.get('content', comment.content)
-    db.session.commit()
-    return jsonify({"message": "Comment updated successfully"}), 200
+    try:
+        comment = patch_row(
+            Comment, comment_id, request.json,
+            required=('content',),
+            optional=(),
+            returning=COMMENT_COLUMNS,
+            ignore_unknown=request.method == 'PUT'
+        )
+        if not comment:
+            return jsonify({"error": "Comment not found"}), 404
+        publish_comment_event('updated', comment._asdict())
+        db.session.commit()
+        return jsonify({"message": "Comment updated successfully", "comment": comment._asdict()}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Server error", "details": str(e)}), 500
 
-@app.route('/comments/<int:comment_id>', methods=['DELETE'])
+@api.route('/comments/<int:comment_id>', methods=['DELETE'])
 def delete_comment(comment_id):
-    comment = Comment.query.get(comment_id)
+    comment = db.session.execute(
+        delete(Comment).where(Comment.id == comment_id).returning(Comment.id, Comment.project_id)
+    ).first()
     if not comment:
+        db.session.rollback()
         return jsonify({"error": "Comment not found"}), 404
-    db.session.delete(comment)
+    record_change(Comment.__tablename__, comment_id, ChangeLog.DELETE)
+    publish_comment_event('deleted', comment._asdict())
     db.session.commit()
     return jsonify({"message": "Comment deleted successfully"}), 200
 
+# What GET /changes returns for each logged entity: response key, model and columns
+SYNC_ENTITIES = {
+    User.__tablename__: ('users', User, USER_COLUMNS),
+    Project.__tablename__: ('projects', Project, PROJECT_COLUMNS),
+    Comment.__tablename__: ('comments', Comment, COMMENT_COLUMNS),
+}
+
+
+@api.route('/changes', methods=['GET'])
+def get_changes():
+    """Users, projects and comments created, updated or deleted after the `since` cursor.
+
+    Upserts carry the current row; deletes come back as ids under "deleted".
+    Entries are read in (txid, id) order. On PostgreSQL only transactions
+    older than every one still in flight are returned, so a slow transaction
+    that took lower ids than one already synced is never skipped: its
+    entries are held back, and everything after them, until it ends.
+    """
+    try:
+        since = decode_change_cursor(request.args['since']) if request.args.get('since') else (0, 0)
+        limit = page_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = db.session.query(ChangeLog.id, ChangeLog.txid, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op).filter(
+        tuple_(ChangeLog.txid, ChangeLog.id) > tuple_(*since)
+    )
+    if db.engine.dialect.name == 'postgresql':
+        # evaluated in this statement's snapshot: every txid below xmin has committed or aborted
+        query = query.filter(ChangeLog.txid < func.txid_snapshot_xmin(func.txid_current_snapshot()))
+    entries = query.order_by(ChangeLog.txid, ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # only the latest change to each row in this page matters
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.op
+
+    changes = {key: [] for key, _, _ in SYNC_ENTITIES.values()}
+    deleted = {key: [] for key, _, _ in SYNC_ENTITIES.values()}
+    for entity, (key, model, columns) in SYNC_ENTITIES.items():
+        upserted = [entity_id for (name, entity_id), op in latest.items() if name == entity and op == ChangeLog.UPSERT]
+        found = set()
+        if upserted:
+            for row in db.session.query(*columns).filter(model.id.in_(upserted)).order_by(model.id):
+                changes[key].append(row._asdict())
+                found.add(row.id)
+        # rows deleted after this page was logged come back as tombstones too
+        deleted[key] = sorted(
+            entity_id for (name, entity_id), op in latest.items()
+            if name == entity and (op == ChangeLog.DELETE or entity_id not in found)
+        )
+
+    cursor = encode_cursor(f'{entries[-1].txid}:{entries[-1].id}') if entries else (request.args.get('since') or None)
+    return jsonify({**changes, "deleted": deleted, "next_cursor": cursor, "has_more": has_more}), 200
+
+
+def create_app(config_name=None):
+    """Build the Flask app for the APP_ENV profile, or `config_name` if given.
+
+    Nothing here opens a database connection or starts a thread, so it is safe
+    to call in the gunicorn master with preload_app (see gunicorn.conf.py).
+    """
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+    app.json = FastJSONProvider(app)
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+
+    from flask_cors import CORS
+    CORS(app, resources={r"/*": {
+        "origins": app.config['FRONTEND_URL'],
+        "supports_credentials": True,
+        "methods": ["GET", "POST", "PUT", "PATCH", "DELETE"],
+        "allow_headers": ["Content-Type", "Authorization"]
+    }})
+
+    # before db.init_app, so the engine is built with the timed pool
+    metrics.init_app(app)
+    db.init_app(app)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        with app.app_context():
+            event.listen(db.engine, 'connect', enable_sqlite_foreign_keys)
+    query_counter.init_app(app, db)
+    slow_query_log.init_app(app, db)
+    profiler.init_app(app)
+    pubsub.init_app(app, db)
+    identity_cache.configure(maxsize=app.config['IDENTITY_CACHE_SIZE'], ttl=app.config['IDENTITY_CACHE_TTL'])
+    project_cache.configure(maxsize=app.config['PROJECT_CACHE_SIZE'], ttl=app.config['PROJECT_CACHE_TTL'])
+    shared_cache.configure(
+        slots=app.config['SHARED_CACHE_SLOTS'],
+        slot_size=app.config['SHARED_CACHE_SLOT_SIZE'],
+        ttl=app.config['SHARED_CACHE_TTL']
+    )
+    password_hasher.configure(max_workers=app.config['HASH_POOL_WORKERS'], max_queue=app.config['HASH_POOL_QUEUE'])
+    app.register_blueprint(api)
+    # start this worker's pubsub listener with its first request, after any fork
+    app.before_request(pubsub.ensure_listening)
+
+    if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+        # Alembic and Flask-Migrate are only needed for `flask db ...`
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    return app
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    app = create_app()
+    app.run(debug=app.config['DEBUG'])
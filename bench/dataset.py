@@ -0,0 +1,122 @@
+"""Seed a synthetic dataset: users with power-law numbers of projects and comments.
+
+Most users own a project or two and a few own dozens; comments pile up on a
+few popular projects the same way, written mostly by the most active users:
+
+    python bench/dataset.py --users 1000 --seed 1
+
+Writes to BENCH_DATABASE_URL (default: a SQLite file in the temp directory),
+dropping and recreating the tables first, so never point it at a real
+database. Rows go in with bulk INSERTs, and every row gets a change_log
+entry as if it had been created through the API. Prints the row counts as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'weldon-bench.db')}"
+os.environ['DATABASE_URL'] = os.getenv('BENCH_DATABASE_URL', DEFAULT_DATABASE_URL)
+os.environ.setdefault('APP_ENV', 'production')
+os.environ.setdefault('JWT_SECRET', 'bench')
+
+from sqlalchemy import func, insert, literal, select, text  # noqa: E402
+
+from app import ChangeLog, Comment, Project, User, create_app, db  # noqa: E402
+
+BATCH_SIZE = 10_000
+# bcrypt of "bench", so seeded users can sign in
+PASSWORD_HASH = '$2b$12$yN22ApuX8BvROCESrP67lurRA0ttsMy9hw9aRb.pNeF1LR5Ta.f8u'
+
+
+def power_law(rng, mean, alpha, cap):
+    """A Pareto-distributed count with roughly the given mean, capped at `cap`."""
+    scale = mean * (alpha - 1) / alpha
+    return min(cap, int(rng.paretovariate(alpha) * scale))
+
+
+def bulk_insert(model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed(users, projects_per_user=3, comments_per_project=4, alpha=1.5, rng=None):
+    rng = rng or random.Random(0)
+    bulk_insert(User, [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': PASSWORD_HASH,
+         'github': f'https://github.com/user{i}' if i % 3 == 0 else None}
+        for i in range(1, users + 1)
+    ])
+
+    projects = []
+    activity = []
+    for user_id in range(1, users + 1):
+        owned = power_law(rng, projects_per_user, alpha, cap=500)
+        activity.append(owned + 1)
+        for _ in range(owned):
+            project_id = len(projects) + 1
+            projects.append({
+                'id': project_id, 'title': f'Project {project_id}', 'user_id': user_id,
+                'description': 'lorem ipsum dolor sit amet ' * rng.randint(1, 20),
+                'image_url': f'https://img.example.com/{project_id}.png',
+                'deployed_url': f'https://{project_id}.example.com' if rng.random() < 0.5 else None,
+            })
+    bulk_insert(Project, projects)
+
+    comments = []
+    user_ids = range(1, users + 1)
+    for project in projects:
+        count = power_law(rng, comments_per_project, alpha, cap=2000)
+        for author in rng.choices(user_ids, weights=activity, k=count):
+            comments.append({
+                'id': len(comments) + 1, 'project_id': project['id'], 'user_id': author,
+                'content': 'nice work ' * rng.randint(1, 10),
+            })
+    bulk_insert(Comment, comments)
+
+    for model in (User, Project, Comment):
+        db.session.execute(insert(ChangeLog).from_select(
+            [ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op],
+            select(literal(model.__tablename__), model.id, literal(ChangeLog.UPSERT)).order_by(model.id)
+        ))
+    if db.engine.dialect.name == 'postgresql':
+        # the ids above were explicit, so move the sequences past them
+        for model in (User, Project, Comment):
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{model.__tablename__}\"', 'id'), "
+                f"(SELECT coalesce(max(id), 0) + 1 FROM \"{model.__tablename__}\"), false)"
+            ))
+    db.session.commit()
+    return {model.__tablename__: db.session.scalar(select(func.count()).select_from(model))
+            for model in (User, Project, Comment, ChangeLog)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--projects-per-user', type=float, default=3)
+    parser.add_argument('--comments-per-project', type=float, default=4)
+    parser.add_argument('--alpha', type=float, default=1.5, help='Pareto shape; lower means a longer tail')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        counts = seed(args.users, args.projects_per_user, args.comments_per_project, args.alpha,
+                      random.Random(args.seed))
+        print(json.dumps({
+            'database': db.engine.dialect.name,
+            'rows': counts,
+            'seconds': time.perf_counter() - start,
+        }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
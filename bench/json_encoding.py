@@ -0,0 +1,63 @@
+"""Time encoding a /projects response with Flask's default provider and FastJSONProvider.
+
+    python bench/json_encoding.py --items 200 --repeat 2000
+
+The payload has the same shape as a GET /projects page. Prints per-call
+microseconds for each provider, and which backend FastJSONProvider used, as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+
+
+def projects_payload(items):
+    return {
+        "items": [
+            {
+                "id": i,
+                "title": f"Project {i}",
+                "description": "A short description of the project, with some detail. " * 4,
+                "image_url": f"https://img.example.com/{i}.png",
+                "deployed_url": f"https://project{i}.example.com",
+                "user_id": i % 50 + 1,
+                "username": f"user{i % 50 + 1}",
+            }
+            for i in range(1, items + 1)
+        ],
+        "next_cursor": "MjAw",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    payload = projects_payload(args.items)
+    app = Flask(__name__)
+    providers = {
+        'default': DefaultJSONProvider(app),
+        'fast': json_provider.FastJSONProvider(app),
+    }
+
+    report = {'items': args.items, 'backend': 'orjson' if json_provider.orjson else 'json'}
+    with app.app_context():
+        for name, provider in providers.items():
+            seconds = timeit.timeit(lambda: provider.response(payload).get_data(), number=args.repeat)
+            report[f'{name}_us'] = seconds / args.repeat * 1e6
+    report['speedup'] = report['default_us'] / report['fast_us']
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
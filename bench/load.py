@@ -0,0 +1,348 @@
+"""Drive every API route and report latency percentiles, throughput and peak RSS.
+
+Seeds a fresh dataset with bench/dataset.py, then sends --requests requests
+to each route, first through the in-process WSGI test client and then over
+HTTP to a real gunicorn started with gunicorn.conf.py:
+
+    python bench/load.py --users 1000 --requests 200 --concurrency 8 --workers 2
+
+Uses BENCH_DATABASE_URL like bench/dataset.py (a SQLite file by default; a
+local PostgreSQL works too) and prints per-route p50/p95/p99 latency,
+throughput and status counts, plus peak RSS, as JSON. Reads run before
+writes and deletes come last, so no route sees rows another one removed.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import resource
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, namedtuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# importing dataset also points DATABASE_URL at the bench database before app is imported
+from dataset import DEFAULT_DATABASE_URL  # noqa: E402
+from app import encode_cursor  # noqa: E402
+
+# `path` and `body` take the run's Context; `share` scales --requests for slow routes
+Route = namedtuple('Route', ['rule', 'method', 'path', 'body', 'share'], defaults=(None, 1.0))
+
+# bcrypt routes cost a hash each, hundreds of milliseconds by design
+HASHING = 0.05
+
+
+class Context:
+    """Ids the routes pick from, and the rows this run may delete."""
+
+    def __init__(self, counts, seed=0):
+        self.rng = random.Random(seed)
+        self.users = counts['user']
+        self.projects = counts['project']
+        self.comments = counts['comment']
+        self.token = None
+        self._serial = 0
+        self._lock = threading.Lock()
+        # deletes take ids from the top down, in an order no read depends on
+        self._doomed = {'user': self.users, 'project': self.projects, 'comment': self.comments}
+
+    def user(self):
+        return self.rng.randint(1, self.users)
+
+    def project(self):
+        return self.rng.randint(1, self.projects)
+
+    def comment(self):
+        return self.rng.randint(1, self.comments)
+
+    def serial(self):
+        with self._lock:
+            self._serial += 1
+            return f'{os.getpid()}-{self._serial}'
+
+    def doomed(self, entity):
+        with self._lock:
+            self._doomed[entity] -= 1
+            return self._doomed[entity] + 1
+
+
+ROUTES = [
+    Route('/users', 'GET', lambda ctx: '/users'),
+    Route('/users', 'GET', lambda ctx: f'/users?limit=200&after={encode_cursor(ctx.user())}'),
+    Route('/users/<int:user_id>', 'GET', lambda ctx: f'/users/{ctx.user()}'),
+    Route('/users/<int:user_id>/projects', 'GET', lambda ctx: f'/users/{ctx.user()}/projects'),
+    Route('/projects', 'GET', lambda ctx: '/projects'),
+    Route('/projects', 'GET', lambda ctx: '/projects?stream=true', share=0.1),
+    Route('/projects/<int:id>', 'GET', lambda ctx: f'/projects/{ctx.project()}'),
+    Route('/projects/<int:project_id>/comments', 'GET', lambda ctx: f'/projects/{ctx.project()}/comments'),
+    Route('/projects/<int:project_id>/comments', 'GET', lambda ctx: f'/projects/{ctx.project()}/comments?embed=user'),
+    Route('/comments', 'GET', lambda ctx: '/comments'),
+    Route('/comments/<int:comment_id>', 'GET', lambda ctx: f'/comments/{ctx.comment()}'),
+    Route('/changes', 'GET', lambda ctx: '/changes?limit=200'),
+    Route('/sign-token', 'GET', lambda ctx: '/sign-token'),
+    Route('/verify-token', 'POST', lambda ctx: '/verify-token'),
+    Route('/metrics', 'GET', lambda ctx: '/metrics'),
+    Route('/signin', 'POST', lambda ctx: '/signin',
+          lambda ctx: {'username': f'user{ctx.user()}', 'password': 'bench'}, HASHING),
+    Route('/signup', 'POST', lambda ctx: '/signup',
+          lambda ctx: {'username': f'new{ctx.serial()}', 'email': f'new{ctx.serial()}@example.com', 'password': 'bench'},
+          HASHING),
+    Route('/projects', 'POST', lambda ctx: '/projects',
+          lambda ctx: {'title': f'Bench {ctx.serial()}', 'description': 'benchmark', 'user_id': ctx.user()}),
+    Route('/comments', 'POST', lambda ctx: '/comments',
+          lambda ctx: {'content': 'benchmark', 'user_id': ctx.user(), 'project_id': ctx.project()}),
+    Route('/users/<int:user_id>', 'PATCH', lambda ctx: f'/users/{ctx.user()}',
+          lambda ctx: {'github': f'https://github.com/{ctx.serial()}'}),
+    Route('/projects/<int:project_id>', 'PATCH', lambda ctx: f'/projects/{ctx.project()}',
+          lambda ctx: {'title': f'Renamed {ctx.serial()}'}),
+    Route('/comments/<int:comment_id>', 'PATCH', lambda ctx: f'/comments/{ctx.comment()}',
+          lambda ctx: {'content': f'edited {ctx.serial()}'}),
+    Route('/comments/<int:comment_id>', 'DELETE', lambda ctx: f"/comments/{ctx.doomed('comment')}"),
+    Route('/projects/<int:project_id>', 'DELETE', lambda ctx: f"/projects/{ctx.doomed('project')}"),
+    Route('/users/<int:user_id>', 'DELETE', lambda ctx: f"/users/{ctx.doomed('user')}"),
+]
+
+# long-lived or operator-only routes that a request/response benchmark does not fit
+NOT_BENCHMARKED = {
+    ('/projects/<int:project_id>/comments/stream', 'GET'),
+    ('/admin/profiles', 'GET'),
+    ('/admin/profiles/<name>', 'GET'),
+}
+
+
+def summarize(route, path_example, samples, statuses, elapsed):
+    latencies = sorted(samples)
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0]
+    return {
+        'route': f'{route.method} {route.rule}',
+        'example': path_example,
+        'requests': len(latencies),
+        'statuses': dict(sorted(statuses.items())),
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'p99_ms': round(p99 * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+    }
+
+
+def drive(send, ctx, requests, concurrency):
+    """Send every route's share of `requests` through send(method, path, body, headers) -> status."""
+    results = []
+    for route in ROUTES:
+        count = max(1, int(requests * route.share))
+        calls = []
+        for _ in range(count):
+            headers = {'Authorization': f'Bearer {ctx.token}'} if route.rule == '/verify-token' else {}
+            calls.append((route.method, route.path(ctx), route.body(ctx) if route.body else None, headers))
+
+        def timed(call):
+            start = time.perf_counter()
+            status = send(*call)
+            return time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        if concurrency > 1:
+            with concurrent.futures.ThreadPoolExecutor(concurrency) as pool:
+                outcomes = list(pool.map(timed, calls))
+        else:
+            outcomes = [timed(call) for call in calls]
+        elapsed = time.perf_counter() - start
+        results.append(summarize(
+            route, calls[0][1], [latency for latency, _ in outcomes],
+            Counter(str(status) for _, status in outcomes), elapsed
+        ))
+    return results
+
+
+def run_client(app, counts, args):
+    """Every route through the WSGI test client, in this process."""
+    client = app.test_client()
+    ctx = Context(counts, args.seed)
+    ctx.token = client.get('/sign-token').json['token']
+
+    def send(method, path, body, headers):
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.get_data()
+        return response.status_code
+
+    start = time.perf_counter()
+    routes = drive(send, ctx, args.requests, 1)
+    return {
+        'target': 'client',
+        'seconds': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_self_mb(),
+        'routes': routes,
+    }
+
+
+def run_gunicorn(counts, args, env):
+    """Every route over HTTP against gunicorn, `args.concurrency` requests at a time."""
+    port = free_port()
+    env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(args.workers))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{port}'
+    sampler = RSSSampler(server.pid)
+    try:
+        wait_for(base, server)
+        sampler.start()
+        ctx = Context(counts, args.seed)
+        with urllib.request.urlopen(f'{base}/sign-token') as response:
+            ctx.token = json.load(response)['token']
+
+        def send(method, path, body, headers):
+            data = json.dumps(body).encode('utf-8') if body is not None else None
+            if data is not None:
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+            request = urllib.request.Request(base + path, data=data, method=method, headers=headers)
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                return e.code
+            except OSError as e:
+                return type(e).__name__
+
+        start = time.perf_counter()
+        routes = drive(send, ctx, args.requests, args.concurrency)
+        seconds = time.perf_counter() - start
+    finally:
+        sampler.stop()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {
+        'target': 'gunicorn',
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'seconds': seconds,
+        'peak_rss_mb': round(sampler.peak_kb / 1024, 1),
+        'routes': routes,
+    }
+
+
+def peak_rss_self_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class RSSSampler(threading.Thread):
+    """Tracks the peak combined RSS of a process and all its descendants, via ps."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                out = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='], capture_output=True, text=True).stdout
+            except OSError:
+                return
+            children, rss = {}, {}
+            for line in out.splitlines():
+                pid, ppid, kb = map(int, line.split())
+                children.setdefault(ppid, []).append(pid)
+                rss[pid] = kb
+            total, pending = 0, [self.pid]
+            while pending:
+                pid = pending.pop()
+                total += rss.get(pid, 0)
+                pending.extend(children.get(pid, ()))
+            self.peak_kb = max(self.peak_kb, total)
+
+    def stop(self):
+        self._stopped.set()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(base, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {server.returncode}')
+        try:
+            with urllib.request.urlopen(f'{base}/users?limit=1', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def seed(args, env):
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, 'bench', 'dataset.py'), '--users', str(args.users), '--seed', str(args.seed)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out)
+
+
+def uncovered_routes(app):
+    covered = {(route.rule, route.method) for route in ROUTES} | NOT_BENCHMARKED
+    return sorted(
+        f'{method} {rule.rule}'
+        for rule in app.url_map.iter_rules() if rule.endpoint != 'static'
+        for method in rule.methods - {'HEAD', 'OPTIONS'}
+        if (rule.rule, method) not in covered and not (method == 'PUT' and (rule.rule, 'PATCH') in covered)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='per route, before its share')
+    parser.add_argument('--concurrency', type=int, default=8, help='gunicorn target only')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--target', choices=['client', 'gunicorn', 'both'], default='both')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['DATABASE_URL'] = env.get('BENCH_DATABASE_URL', DEFAULT_DATABASE_URL)
+    env.setdefault('APP_ENV', 'production')
+    env.setdefault('JWT_SECRET', 'bench')
+    os.environ.update(env)
+
+    from app import create_app
+    app = create_app()
+    report = {'database': env['DATABASE_URL'].split(':', 1)[0], 'runs': []}
+    if args.target in ('client', 'both'):
+        report['dataset'] = seed(args, env)['rows']
+        report['runs'].append(run_client(app, report['dataset'], args))
+    if args.target in ('gunicorn', 'both'):
+        # every run starts from the same rows
+        report['dataset'] = seed(args, env)['rows']
+        report['runs'].append(run_gunicorn(report['dataset'], args, env))
+    report['not_covered'] = uncovered_routes(app)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
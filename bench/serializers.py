@@ -0,0 +1,89 @@
+"""Compare ORM entity hydration with column-only projections for the /projects serializer.
+
+Seeds a fixture of --rows projects (100k by default) spread over 1k users,
+then times serializing all of them both ways:
+
+    python bench/serializers.py --rows 100000 --repeat 3
+
+Runs against TEST_DATABASE_URL (default: in-memory SQLite), creating and
+dropping the tables itself, so never point it at a real database. Prints
+rows/sec for each strategy as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('APP_ENV', 'test')
+os.environ.setdefault('JWT_SECRET', 'bench')
+
+from app import PROJECT_WITH_AUTHOR_COLUMNS, Project, User, create_app, db  # noqa: E402
+
+
+def seed(rows, users=1000):
+    db.session.execute(db.insert(User), [
+        {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+        for i in range(1, users + 1)
+    ])
+    db.session.execute(db.insert(Project), [
+        {'id': i, 'title': f'Project {i}', 'description': 'lorem ipsum ' * 40,
+         'image_url': f'https://img.example.com/{i}.png', 'user_id': i % users + 1}
+        for i in range(1, rows + 1)
+    ])
+    db.session.commit()
+
+
+def serialize_entities():
+    return [
+        {
+            "id": project.id,
+            "title": project.title,
+            "description": project.description,
+            "image_url": project.image_url,
+            "deployed_url": project.deployed_url,
+            "user_id": project.user_id,
+            "username": project.user.username
+        }
+        for project in Project.query.order_by(Project.id).all()
+    ]
+
+
+def serialize_columns():
+    query = db.session.query(*PROJECT_WITH_AUTHOR_COLUMNS).join(Project.user).order_by(Project.id)
+    return [row._asdict() for row in query.all()]
+
+
+def measure(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        count = len(fn())
+        best = min(best, time.perf_counter() - start)
+    return {'rows': count, 'seconds': best, 'rows_per_sec': count / best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        entities = measure(serialize_entities, args.repeat)
+        columns = measure(serialize_columns, args.repeat)
+        print(json.dumps({
+            'entities': entities,
+            'columns': columns,
+            'speedup': columns['rows_per_sec'] / entities['rows_per_sec'],
+        }, indent=2))
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Measure how long a cold process takes to import the app and serve its first request.
+
+Each sample runs in a fresh interpreter so nothing is already imported:
+
+    python bench/startup.py --runs 10 --path /projects
+
+Uses DATABASE_URL from the environment (an empty SQLite database by default)
+and prints the timings as JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+flask_app = module.create_app()
+t2 = time.perf_counter()
+with flask_app.app_context():
+    module.db.create_all()
+client = flask_app.test_client()
+t3 = time.perf_counter()
+status = client.get(sys.argv[1]).status_code
+t4 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t4 - t3) * 1000,
+    'status': status,
+}))
+"""
+
+
+def run_once(path, env):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE, path],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/projects')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+    env.setdefault('JWT_SECRET', 'bench')
+    env.setdefault('APP_ENV', 'production')
+
+    samples = [run_once(args.path, env) for _ in range(args.runs)]
+    report = {'runs': args.runs, 'path': args.path}
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        values = [sample[key] for sample in samples]
+        report[key] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import sys
+
+
+def threads_are_greenlets():
+    """True once gevent has monkey-patched threading, as gunicorn.conf.py does for gevent workers.
+
+    Threads started after that are greenlets on one OS thread: blocking C
+    calls stall all of them, and sys._current_frames() cannot see them.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
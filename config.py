@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_url():
+    return os.getenv('DATABASE_URL', '').replace("postgres://", "postgresql://", 1)
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = env_bool('SQLALCHEMY_ECHO', False)
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET')
+    FRONTEND_URL = os.getenv('FRONTEND_URL', '*')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # per-request query count and database time in a Server-Timing header
+    QUERY_STATS_HEADERS = env_bool('QUERY_STATS_HEADERS', False)
+    # a statement repeated this often in one request is logged as a possible N+1
+    NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 5))
+    # /metrics: set a directory to merge every gunicorn worker's metrics, and a
+    # token to require "Authorization: Bearer <token>"
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 1))
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # statements slower than this are kept for `flask slow-queries`; 0 turns it off
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_BUFFER = int(os.getenv('SLOW_QUERY_BUFFER', 500))
+    # share of slow SELECTs re-run under EXPLAIN (ANALYZE, BUFFERS), PostgreSQL only
+    SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE', 0))
+    SLOW_QUERY_DIR = os.getenv('SLOW_QUERY_DIR', os.path.join(tempfile.gettempdir(), 'app-slow-queries'))
+    # per-request profiles: on an X-Profile token signed with PROFILE_SECRET, or a random share
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 1))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'app-profiles'))
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 50))
+
+    # connection pool, see https://docs.sqlalchemy.org/en/20/core/pooling.html
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 15000))
+
+    DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+    STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', 1000))
+    # auto: postgres (LISTEN/NOTIFY) on PostgreSQL, local (this process only) otherwise
+    PUBSUB_BACKEND = os.getenv('PUBSUB_BACKEND', 'auto')
+    PUBSUB_SOCKET_DIR = os.getenv('PUBSUB_SOCKET_DIR', os.path.join(tempfile.gettempdir(), 'app-pubsub'))
+    SSE_KEEPALIVE_SECONDS = int(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+    # read routes always send an ETag; these let clients skip even the revalidation
+    LIST_CACHE_CONTROL = os.getenv('LIST_CACHE_CONTROL', 'no-cache')
+    DETAIL_CACHE_CONTROL = os.getenv('DETAIL_CACHE_CONTROL', 'public, max-age=5, must-revalidate')
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', 60))
+    IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', 1024))
+    PROJECT_CACHE_TTL = int(os.getenv('PROJECT_CACHE_TTL', 30))
+    PROJECT_CACHE_SIZE = int(os.getenv('PROJECT_CACHE_SIZE', 1024))
+    # shared across workers: SLOTS * SLOT_SIZE bytes, 0 slots disables it
+    SHARED_CACHE_SLOTS = int(os.getenv('SHARED_CACHE_SLOTS', 256))
+    SHARED_CACHE_SLOT_SIZE = int(os.getenv('SHARED_CACHE_SLOT_SIZE', 128 * 1024))
+    SHARED_CACHE_TTL = int(os.getenv('SHARED_CACHE_TTL', 300))
+    TRUST_TOKEN_CLAIMS = env_bool('TRUST_TOKEN_CLAIMS', False)
+    HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', 2))
+    HASH_POOL_QUEUE = int(os.getenv('HASH_POOL_QUEUE', 8))
+    HASH_POOL_RETRY_AFTER = int(os.getenv('HASH_POOL_RETRY_AFTER', 1))
+
+    @property
+    def SQLALCHEMY_ENGINE_OPTIONS(self):
+        if self.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+            # SQLite uses a single-connection pool that rejects the sizing options
+            return {}
+        options = {
+            'pool_size': self.DB_POOL_SIZE,
+            'max_overflow': self.DB_MAX_OVERFLOW,
+            'pool_timeout': self.DB_POOL_TIMEOUT,
+            'pool_recycle': self.DB_POOL_RECYCLE,
+            'pool_pre_ping': self.DB_POOL_PRE_PING,
+        }
+        if self.SQLALCHEMY_DATABASE_URI.startswith('postgresql') and self.DB_STATEMENT_TIMEOUT_MS:
+            # migrations/env.py lifts this again for `flask db upgrade`
+            options['connect_args'] = {'options': f'-c statement_timeout={self.DB_STATEMENT_TIMEOUT_MS}'}
+        return options
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    SQLALCHEMY_ECHO = env_bool('SQLALCHEMY_ECHO', True)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+    QUERY_STATS_HEADERS = env_bool('QUERY_STATS_HEADERS', True)
+
+
+class ProductionConfig(Config):
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///:memory:')
+    QUERY_STATS_HEADERS = env_bool('QUERY_STATS_HEADERS', True)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING')
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'test': TestConfig,
+}
+
+
+def get_config(name=None):
+    """Return the config object for `name`, or for APP_ENV (default: production)."""
+    name = name or os.getenv('APP_ENV', 'production')
+    try:
+        return configs[name]()
+    except KeyError:
+        raise ValueError(f"Unknown APP_ENV '{name}', expected one of {', '.join(configs)}")
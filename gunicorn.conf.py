@@ -0,0 +1,43 @@
+import gc
+import glob
+import os
+
+# GET /projects/<id>/comments/stream holds its connection open, which would
+# occupy a whole sync worker per open tab, so gevent is the default.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    # Patch before the app is preloaded (preload_app below), so the locks, queues and pools
+    # it builds are gevent-aware; the worker would only patch after the fork.
+    from gevent import monkey
+    monkey.patch_all()
+    # let psycopg2 yield to other greenlets while waiting on the database
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+# Import the app once in the master so forked workers share its pages
+# copy-on-write instead of each re-importing everything.
+preload_app = True
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+
+def on_starting(server):
+    # metrics snapshots from a previous run would be summed with this one's
+    directory = os.getenv('METRICS_MULTIPROC_DIR')
+    if directory:
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.unlink(path)
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation, so the
+    # collector in the child never touches (and so never copies) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections must not be shared across processes; drop any the master
+    # may have opened and let each worker build its own pool.
+    from app import db
+    with server.app.wsgi().app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+from concurrency import threads_are_greenlets
+
+
+class PoolSaturated(Exception):
+    """Raised when the hashing pool has no free worker or queue slot."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small, bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so threads are enough to keep the
+    work off the request thread. Under gevent's monkey patching the pool uses
+    gevent's native-thread executor instead, since patched threads are
+    greenlets and bcrypt would block the whole worker. At most
+    `max_workers + max_queue` calls are admitted at once; anything beyond
+    that fails fast with PoolSaturated instead of queueing behind other
+    logins.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8, timeout=10):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._admitted = 0
+        self._active = 0
+        self._rejected = 0
+        self.timeout = timeout
+        self.configure(max_workers, max_queue)
+
+    def configure(self, max_workers, max_queue):
+        with self._lock:
+            if self._executor is not None:
+                if (max_workers, max_queue) == (self.max_workers, self.max_queue):
+                    # another app in the same process, e.g. one per test
+                    return
+                raise RuntimeError('PasswordHasher cannot be reconfigured once it has started')
+            self.max_workers = max_workers
+            self.max_queue = max_queue
+            self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    def _get_executor(self):
+        # created on first use so no threads exist before gunicorn forks
+        with self._lock:
+            if self._executor is None:
+                if threads_are_greenlets():
+                    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                    self._executor = NativeThreadPoolExecutor(self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='bcrypt')
+            return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            self._active += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._admitted -= 1
+            self._slots.release()
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PoolSaturated('Password hashing pool is saturated')
+        with self._lock:
+            self._admitted += 1
+        try:
+            future = self._get_executor().submit(self._run, fn, *args)
+        except Exception:
+            with self._lock:
+                self._admitted -= 1
+            self._slots.release()
+            raise
+        return future.result(timeout=self.timeout)
+
+    def hash(self, password):
+        return self._submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+    def check(self, password, password_hash):
+        return self._submit(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'capacity': self.max_workers + self.max_queue,
+                'active': self._active,
+                'queued': self._admitted - self._active,
+                'rejected_total': self._rejected,
+            }
@@ -0,0 +1,47 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - pinned in requirements.txt, but not required
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson when it is installed.
+
+    Falls back to the stdlib encoder otherwise. Either way responses are built
+    from UTF-8 bytes, keys are left in insertion order and output is compact
+    unless the app is in debug mode (or `compact` is set to False). Types
+    neither encoder knows go through Flask's usual `default` hook, and
+    datetimes are passed to it too so both backends render them the same way.
+    """
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps_bytes(self, obj, pretty=False):
+        if orjson is not None:
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=self.default, option=option)
+        if pretty:
+            return json.dumps(obj, default=self.default, ensure_ascii=False, indent=2).encode('utf-8')
+        return json.dumps(obj, default=self.default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, pretty=pretty), mimetype=self.mimetype)
@@ -0,0 +1,229 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import current_app, g, request
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def timed_pool(metrics):
+    """A QueuePool that reports how long each checkout waited for a connection."""
+
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.observe('db_pool_checkout_wait_seconds', time.perf_counter() - started)
+
+    return TimedQueuePool
+
+
+class Metrics:
+    """Counters, gauges and histograms served at /metrics in Prometheus text format.
+
+    Request count, latency and in-flight requests are recorded per route
+    template; everything else comes from collectors, callables returning
+    (name, labels, value) samples that are read at scrape time.
+
+    Each process keeps its own values. With METRICS_MULTIPROC_DIR set, every
+    worker also writes a snapshot there from a background thread every
+    METRICS_FLUSH_SECONDS (and on each scrape), and /metrics serves the sum
+    over all the snapshots. Counters and histograms of workers that have
+    exited are kept; their gauges are dropped.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._types = {}
+        self._help = {}
+        self._counters = defaultdict(float)
+        self._gauges = defaultdict(float)
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self.describe('http_requests_total', 'counter', 'Requests handled, by route and status.')
+        self.describe('http_request_duration_seconds', 'histogram', 'Time to build each response, by route.')
+        self.describe('http_requests_in_flight', 'gauge', 'Requests being handled right now.')
+        self.describe('db_pool_checkout_wait_seconds', 'histogram', 'Time spent waiting for a pooled connection.')
+
+    def describe(self, name, metric_type, help_text):
+        self._types[name] = metric_type
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[name, _labels(labels)] += amount
+
+    def add(self, name, amount, **labels):
+        with self._lock:
+            self._gauges[name, _labels(labels)] += amount
+
+    def observe(self, name, value, **labels):
+        key = name, _labels(labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def init_app(self, app):
+        """Hook request timing into `app` and add /metrics. Call before db.init_app."""
+        self.multiproc_dir = app.config['METRICS_MULTIPROC_DIR']
+        self.flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+        self.token = app.config['METRICS_TOKEN']
+        engine_options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        if 'pool_size' in engine_options:
+            engine_options['poolclass'] = timed_pool(self)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def _before_request(self):
+        if self.multiproc_dir and self._flusher_pid != os.getpid():
+            self._start_flusher(current_app._get_current_object())
+        g.metrics_started = time.perf_counter()
+        self.add('http_requests_in_flight', 1)
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            self.inc('http_requests_total', method=request.method, route=route, status=response.status_code)
+            self.observe('http_request_duration_seconds', time.perf_counter() - started, method=request.method, route=route)
+        return response
+
+    def _teardown_request(self, exc):
+        if g.pop('metrics_started', None) is not None:
+            self.add('http_requests_in_flight', -1)
+
+    def snapshot(self):
+        """This process's samples, collectors included, as plain JSON-able data."""
+        collected = []
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                collected.append((name, _labels(labels), value))
+        with self._lock:
+            counters = [[name, labels, value] for (name, labels), value in self._counters.items()]
+            gauges = [[name, labels, value] for (name, labels), value in self._gauges.items()]
+            histograms = [[name, labels, list(h[0]), h[1], h[2]] for (name, labels), h in self._histograms.items()]
+        for name, labels, value in collected:
+            (counters if self._types.get(name) == 'counter' else gauges).append([name, labels, value])
+        return {'pid': os.getpid(), 'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def _start_flusher(self, app):
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, args=(app,), name='metrics-flusher', daemon=True).start()
+
+    def _flush_forever(self, app):
+        # collectors read the engine, which needs an app context
+        with app.app_context():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception('writing the metrics snapshot failed')
+
+    def flush(self):
+        path = os.path.join(self.multiproc_dir, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f'{path}.tmp', path)
+
+    def _snapshots(self):
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _alive(snapshot['pid']):
+                snapshot['gauges'] = []
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        counters, gauges, histograms = defaultdict(float), defaultdict(float), {}
+        for snapshot in self._snapshots():
+            for name, labels, value in snapshot['counters']:
+                counters[name, tuple(map(tuple, labels))] += value
+            for name, labels, value in snapshot['gauges']:
+                gauges[name, tuple(map(tuple, labels))] += value
+            for name, labels, buckets, total, count in snapshot['histograms']:
+                merged = histograms.setdefault((name, tuple(map(tuple, labels))), [[0] * len(buckets), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                merged[1] += total
+                merged[2] += count
+
+        samples = defaultdict(list)
+        for (name, labels), value in list(counters.items()) + list(gauges.items()):
+            samples[name].append(f'{name}{_format_labels(labels)} {value:g}')
+        for (name, labels), (buckets, total, count) in histograms.items():
+            cumulative = 0
+            for bound, bucket in zip(list(self.buckets) + ['+Inf'], buckets):
+                cumulative += bucket
+                samples[name].append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            samples[name].append(f'{name}_sum{_format_labels(labels)} {total:g}')
+            samples[name].append(f'{name}_count{_format_labels(labels)} {count}')
+
+        lines = []
+        for name in sorted(samples):
+            if name in self._help:
+                lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {self._types[name]}')
+            lines.extend(samples[name])
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+        return current_app.response_class(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
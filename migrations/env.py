@@ -1,9 +1,11 @@
 import logging
 from logging.config import fileConfig
 
+import sqlalchemy as sa
 from flask import current_app
 
 from alembic import context
+from alembic.operations import MigrateOperation, Operations
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -45,6 +47,99 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+@Operations.register_operation('create_index_concurrently')
+class CreateIndexConcurrentlyOp(MigrateOperation):
+    """Build an index without blocking writes to the table.
+
+    On PostgreSQL this runs CREATE INDEX CONCURRENTLY in an autocommit
+    block, since it cannot run inside a transaction. A valid index of the
+    same name is left alone, and an INVALID one left by an interrupted
+    build is dropped and rebuilt, so the migration can be safely re-run.
+    Other dialects get a plain CREATE INDEX.
+
+    Usage in a migration: op.create_index_concurrently(name, table, columns)
+    """
+
+    def __init__(self, index_name, table_name, columns):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.columns = columns
+
+    @classmethod
+    def create_index_concurrently(cls, operations, index_name, table_name, columns):
+        return operations.invoke(cls(index_name, table_name, columns))
+
+    def reverse(self):
+        return DropIndexConcurrentlyOp(self.index_name, self.table_name, self.columns)
+
+
+@Operations.register_operation('drop_index_concurrently')
+class DropIndexConcurrentlyOp(MigrateOperation):
+    """Drop an index without blocking writes; the inverse of create_index_concurrently."""
+
+    def __init__(self, index_name, table_name, columns=None):
+        self.index_name = index_name
+        self.table_name = table_name
+        self.columns = columns
+
+    @classmethod
+    def drop_index_concurrently(cls, operations, index_name, table_name):
+        return operations.invoke(cls(index_name, table_name))
+
+    def reverse(self):
+        return CreateIndexConcurrentlyOp(self.index_name, self.table_name, self.columns)
+
+
+def _index_is_valid(operations, index_name):
+    # None if the index does not exist, otherwise pg_index.indisvalid
+    return operations.get_bind().execute(
+        sa.text(
+            'SELECT i.indisvalid FROM pg_class c '
+            'JOIN pg_index i ON i.indexrelid = c.oid '
+            'WHERE c.relname = :name'
+        ),
+        {'name': index_name},
+    ).scalar()
+
+
+@Operations.implementation_for(CreateIndexConcurrentlyOp)
+def create_index_concurrently(operations, operation):
+    migration_context = operations.get_context()
+    if migration_context.dialect.name != 'postgresql':
+        operations.create_index(operation.index_name, operation.table_name, operation.columns)
+        return
+
+    with migration_context.autocommit_block():
+        valid = None if migration_context.as_sql else _index_is_valid(operations, operation.index_name)
+        if valid:
+            logger.info('Index %s already exists, skipping.', operation.index_name)
+            return
+        if valid is False:
+            logger.info('Dropping invalid index %s left by an interrupted build.', operation.index_name)
+            operations.drop_index(
+                operation.index_name, table_name=operation.table_name,
+                postgresql_concurrently=True, if_exists=True
+            )
+        operations.create_index(
+            operation.index_name, operation.table_name, operation.columns,
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+@Operations.implementation_for(DropIndexConcurrentlyOp)
+def drop_index_concurrently(operations, operation):
+    migration_context = operations.get_context()
+    if migration_context.dialect.name != 'postgresql':
+        operations.drop_index(operation.index_name, table_name=operation.table_name)
+        return
+
+    with migration_context.autocommit_block():
+        operations.drop_index(
+            operation.index_name, table_name=operation.table_name,
+            postgresql_concurrently=True, if_exists=True
+        )
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -97,9 +192,24 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # batch migrations copy and drop tables; with the app's foreign
+            # keys pragma on, dropping the old table would cascade-delete rows
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+        elif connection.dialect.name == 'postgresql':
+            # the app's DB_STATEMENT_TIMEOUT_MS is meant for requests; it would
+            # cancel long index builds and constraint validations half way,
+            # leaving INVALID indexes behind
+            connection.exec_driver_sql('SET statement_timeout = 0')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            # one transaction per revision, so the autocommit blocks used by
+            # concurrent index builds only commit their own revision's work
+            transaction_per_migration=True,
             **conf_args
         )
 
@@ -0,0 +1,27 @@
+"""Add index on comment.project_id
+
+Built with CREATE INDEX CONCURRENTLY (see create_index_concurrently in
+env.py) so writes to comment are not blocked while it builds.
+
+Revision ID: 4f2a9c1d7e35
+Revises: dcd190521617
+Create Date: 2025-01-08 18:21:44.913205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c1d7e35'
+down_revision = 'dcd190521617'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index_concurrently('ix_comment_project_id', 'comment', ['project_id'])
+
+
+def downgrade():
+    op.drop_index_concurrently('ix_comment_project_id', 'comment')
@@ -0,0 +1,30 @@
+"""Add txid to change_log so GET /changes can hold back in-flight transactions
+
+Revision ID: 8d1f3b6a2e47
+Revises: 5b9e2d7c4a61
+Create Date: 2025-02-03 10:12:05.481337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1f3b6a2e47'
+down_revision = '5b9e2d7c4a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a constant default does not rewrite the table on PostgreSQL 11+; existing
+    # entries get txid 0 and so sort before everything logged from now on
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('txid', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index_concurrently('ix_change_log_txid_id', 'change_log', ['txid', 'id'])
+
+
+def downgrade():
+    op.drop_index_concurrently('ix_change_log_txid_id', 'change_log')
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.drop_column('txid')
@@ -0,0 +1,30 @@
+"""Add indexes on project.user_id and comment.user_id
+
+Built with CREATE INDEX CONCURRENTLY (see create_index_concurrently in
+env.py) so writes to project and comment are not blocked. The index on
+comment.project_id is built the same way in 4f2a9c1d7e35.
+
+Revision ID: a81d3e6f0b92
+Revises: 4f2a9c1d7e35
+Create Date: 2025-01-10 11:04:37.208164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a81d3e6f0b92'
+down_revision = '4f2a9c1d7e35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index_concurrently('ix_project_user_id', 'project', ['user_id'])
+    op.create_index_concurrently('ix_comment_user_id', 'comment', ['user_id'])
+
+
+def downgrade():
+    op.drop_index_concurrently('ix_comment_user_id', 'comment')
+    op.drop_index_concurrently('ix_project_user_id', 'project')
@@ -0,0 +1,54 @@
+"""Use ON DELETE CASCADE for project and comment foreign keys
+
+The constraints are re-created as NOT VALID and then validated after the
+swap has committed, so the validation scan does not hold the ACCESS
+EXCLUSIVE lock that blocks writes. The naming convention matches
+PostgreSQL's default constraint names so the unnamed constraints from
+bb8ff2fbe40a can be dropped, including under SQLite batch mode.
+
+Revision ID: c3e57b8d2a14
+Revises: a81d3e6f0b92
+Create Date: 2025-01-14 16:47:12.530981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e57b8d2a14'
+down_revision = 'a81d3e6f0b92'
+branch_labels = None
+depends_on = None
+
+naming_convention = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+foreign_keys = [
+    # (table, column, referenced table)
+    ('project', 'user_id', 'user'),
+    ('comment', 'user_id', 'user'),
+    ('comment', 'project_id', 'project'),
+]
+
+
+def replace_foreign_keys(ondelete):
+    for table, column, referent in foreign_keys:
+        name = f'{table}_{column}_fkey'
+        with op.batch_alter_table(table, schema=None, naming_convention=naming_convention) as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, referent, [column], ['id'], ondelete=ondelete, postgresql_not_valid=True
+            )
+
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for table, column, _ in foreign_keys:
+                op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT {table}_{column}_fkey')
+
+
+def upgrade():
+    replace_foreign_keys(ondelete='CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(ondelete=None)
@@ -0,0 +1,102 @@
+"""Add created_at, updated_at and version to user, project and comment
+
+Online-safe on PostgreSQL: the columns are added nullable with no
+default (a catalog-only change), defaults are attached for new rows,
+existing rows are backfilled in autocommitted chunks of BATCH_SIZE ids, and
+NOT NULL is enforced through a validated CHECK constraint so SET NOT NULL
+does not have to scan the table under an exclusive lock. The indexes are
+built concurrently.
+
+Revision ID: e7f0a4b6c915
+Revises: c3e57b8d2a14
+Create Date: 2025-01-21 10:12:05.774312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7f0a4b6c915'
+down_revision = 'c3e57b8d2a14'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+tables = ['user', 'project', 'comment']
+columns = ['created_at', 'updated_at', 'version']
+
+
+def backfill(table_name):
+    table = sa.table(
+        table_name, sa.column('id', sa.Integer), sa.column('created_at', sa.DateTime(timezone=True)),
+        sa.column('updated_at', sa.DateTime(timezone=True)), sa.column('version', sa.Integer)
+    )
+    backfill_rows = table.update().values(created_at=sa.func.now(), updated_at=sa.func.now(), version=1)
+    if op.get_context().as_sql:
+        # no live connection to find the id range; emit a single statement
+        op.execute(backfill_rows.where(table.c.version.is_(None)))
+        return
+
+    bind = op.get_bind()
+    low, high = bind.execute(sa.select(sa.func.min(table.c.id), sa.func.max(table.c.id))).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, BATCH_SIZE):
+        bind.execute(
+            backfill_rows.where(table.c.id >= start, table.c.id < start + BATCH_SIZE, table.c.version.is_(None))
+        )
+
+
+def set_not_null_postgresql(table_name):
+    for column in columns:
+        check = f'{table_name}_{column}_not_null'
+        op.execute(f'ALTER TABLE "{table_name}" ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID')
+        op.execute(f'ALTER TABLE "{table_name}" VALIDATE CONSTRAINT {check}')
+        # PostgreSQL 12+ uses the validated constraint to skip the full scan
+        op.execute(f'ALTER TABLE "{table_name}" ALTER COLUMN {column} SET NOT NULL')
+        op.execute(f'ALTER TABLE "{table_name}" DROP CONSTRAINT {check}')
+
+
+def upgrade():
+    postgresql = op.get_context().dialect.name == 'postgresql'
+    for table_name in tables:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(timezone=True), nullable=True))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=True))
+        if postgresql:
+            op.alter_column(table_name, 'created_at', server_default=sa.func.now())
+            op.alter_column(table_name, 'updated_at', server_default=sa.func.now())
+            op.alter_column(table_name, 'version', server_default='1')
+
+    if postgresql:
+        # every chunk and constraint step commits on its own, so no lock is
+        # held for longer than a single statement
+        with op.get_context().autocommit_block():
+            for table_name in tables:
+                backfill(table_name)
+            for table_name in tables:
+                set_not_null_postgresql(table_name)
+    else:
+        for table_name in tables:
+            backfill(table_name)
+            with op.batch_alter_table(table_name, schema=None) as batch_op:
+                batch_op.alter_column('created_at', nullable=False, server_default=sa.func.now())
+                batch_op.alter_column('updated_at', nullable=False, server_default=sa.func.now())
+                batch_op.alter_column('version', nullable=False, server_default='1')
+
+    for table_name in tables:
+        op.create_index_concurrently(f'ix_{table_name}_created_at', table_name, ['created_at'])
+        op.create_index_concurrently(f'ix_{table_name}_updated_at', table_name, ['updated_at'])
+
+
+def downgrade():
+    for table_name in tables:
+        op.drop_index_concurrently(f'ix_{table_name}_updated_at', table_name)
+        op.drop_index_concurrently(f'ix_{table_name}_created_at', table_name)
+    for table_name in tables:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('version')
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
@@ -0,0 +1,201 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import click
+import jwt
+from flask import abort, current_app, g, jsonify, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+
+from concurrency import threads_are_greenlets
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_SCOPE = 'profile'
+SUFFIX = '.folded'
+
+
+class StackSampler:
+    """Samples the calling thread's Python stack every `interval` seconds into collapsed-stack counts.
+
+    The sampler needs the GIL to run, so while the request thread is busy in
+    Python it is sampled at most once per sys.getswitchinterval() (5 ms).
+
+    Under gevent's monkey patching the caller is a greenlet, which neither a
+    patched thread (another greenlet) nor sys._current_frames() can see, so
+    the sampler runs on one of the hub's native threads and reads the
+    greenlet's own frame while it is switched out, or the worker thread's
+    frame while it is running.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = False
+
+    def start(self):
+        if threads_are_greenlets():
+            from gevent import get_hub, getcurrent, monkey
+            self._thread_id = monkey.get_original('_thread', 'get_ident')()
+            self._greenlet = getcurrent()
+            self._sleep = monkey.get_original('time', 'sleep')
+            self._done = get_hub().threadpool.spawn(self.run)
+        else:
+            self._thread_id = threading.get_ident()
+            self._greenlet = None
+            self._sleep = time.sleep
+            self._done = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+            self._done.start()
+
+    def _frame(self):
+        if self._greenlet is not None and self._greenlet.gr_frame is not None:
+            return self._greenlet.gr_frame
+        return sys._current_frames().get(self._thread_id)
+
+    def run(self):
+        while True:
+            self._sleep(self.interval)
+            if self._stopped:
+                return
+            frame = self._frame()
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(reversed(frames))] += 1
+
+    def stop(self):
+        self._stopped = True
+        if self._greenlet is not None:
+            self._done.get()
+        else:
+            self._done.join()
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for single requests.
+
+    A request is profiled when it carries an X-Profile header holding a JWT
+    signed with PROFILE_SECRET (scope "profile", see `flask profile-token`),
+    or at random for a PROFILE_SAMPLE_RATE share of requests. Its stack is
+    sampled every PROFILE_INTERVAL_MS from a helper thread, and the result
+    is written to PROFILE_DIR in the collapsed-stack format that
+    flamegraph.pl and speedscope read; only the newest PROFILE_KEEP files
+    are kept. The response names its file in X-Profile-File.
+
+    GET /admin/profiles and /admin/profiles/<name> list and download them,
+    given the same kind of token as a bearer token. Without PROFILE_SECRET
+    only sampling works and the admin routes are closed.
+    """
+
+    def init_app(self, app):
+        self.secret = app.config['PROFILE_SECRET']
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.interval = app.config['PROFILE_INTERVAL_MS'] / 1000
+        self.directory = app.config['PROFILE_DIR']
+        self.keep = app.config['PROFILE_KEEP']
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/admin/profiles', 'list_profiles', self.list_profiles)
+        app.add_url_rule('/admin/profiles/<name>', 'download_profile', self.download_profile)
+        app.cli.add_command(profile_token_command)
+
+    def authorized(self, token):
+        if not self.secret or not token:
+            return False
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=['HS256'], options={'require': ['exp']})
+        except jwt.InvalidTokenError:
+            return False
+        return claims.get('scope') == PROFILE_SCOPE
+
+    def _wanted(self):
+        if PROFILE_HEADER in request.headers:
+            return self.authorized(request.headers[PROFILE_HEADER])
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _before_request(self):
+        if request.endpoint in ('list_profiles', 'download_profile') or not self._wanted():
+            return
+        g.profile_sampler = StackSampler(self.interval)
+        g.profile_started = time.time()
+        g.profile_sampler.start()
+
+    def _after_request(self, response):
+        sampler = g.pop('profile_sampler', None)
+        if sampler is None:
+            return response
+        sampler.stop()
+        name = self._save(sampler.stacks)
+        response.headers['X-Profile-File'] = name
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request does not run if the request failed before reaching it
+        sampler = g.pop('profile_sampler', None)
+        if sampler is not None:
+            sampler.stop()
+
+    def _save(self, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        started = datetime.fromtimestamp(g.profile_started, timezone.utc).strftime('%Y%m%dT%H%M%S.%f')
+        name = secure_filename(f'{started}-{os.getpid()}-{request.method}-{request.endpoint or "unmatched"}') + SUFFIX
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.writelines(f'{stack} {count}\n' for stack, count in stacks.items())
+        for old in self._files()[self.keep:]:
+            try:
+                os.unlink(os.path.join(self.directory, old))
+            except FileNotFoundError:
+                pass
+        return name
+
+    def _files(self):
+        """Profile file names, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(SUFFIX)]
+        except FileNotFoundError:
+            return []
+        return sorted(names, reverse=True)
+
+    def _require_token(self):
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not self.authorized(token):
+            abort(401)
+
+    def list_profiles(self):
+        self._require_token()
+        profiles = []
+        for name in self._files():
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            profiles.append({'name': name, 'size': size})
+        return jsonify({'profiles': profiles})
+
+    def download_profile(self, name):
+        self._require_token()
+        return send_from_directory(self.directory, name, mimetype='text/plain', as_attachment=True)
+
+
+def _short_path(filename):
+    return os.sep.join(filename.split(os.sep)[-2:])
+
+
+@click.command('profile-token')
+@click.option('--minutes', default=15, show_default=True, help='How long the token stays valid.')
+@with_appcontext
+def profile_token_command(minutes):
+    """Print a token for the X-Profile header and the /admin/profiles routes."""
+    secret = current_app.config['PROFILE_SECRET']
+    if not secret:
+        raise click.ClickException('PROFILE_SECRET is not set')
+    expires = datetime.now(timezone.utc) + timedelta(minutes=minutes)
+    click.echo(jwt.encode({'scope': PROFILE_SCOPE, 'exp': expires}, secret, algorithm='HS256'))
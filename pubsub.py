@@ -0,0 +1,273 @@
+import glob
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'pubsub_pending'
+
+
+class UnixSocketTransport:
+    """Stand-in for LISTEN/NOTIFY between processes on one machine, without Postgres.
+
+    Every listening process binds a datagram socket named after its pid in
+    `directory`; a publisher sends each message to every socket there,
+    removing the ones whose process has gone away.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send(self, channel, data):
+        message = json.dumps([channel, data]).encode('utf-8')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            for path in glob.glob(os.path.join(self.directory, '*.sock')):
+                try:
+                    sock.sendto(message, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+
+    def listen(self, dispatch):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.sock')
+        if os.path.exists(path):
+            os.unlink(path)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.bind(path)
+            while True:
+                channel, data = json.loads(sock.recv(65536))
+                dispatch(channel, data)
+
+
+class PubSub:
+    """Channel publish/subscribe tied to the database transaction.
+
+    publish() only queues a message on the session: it is sent when that
+    session commits and dropped if it rolls back, so subscribers never hear
+    about writes that did not happen. The PUBSUB_BACKEND setting picks how
+    messages reach every worker's registered handlers:
+
+    - postgres: pg_notify inside the committing transaction, received by one
+      LISTEN connection per process (the default on PostgreSQL);
+    - unix: datagrams to every process's socket in PUBSUB_SOCKET_DIR, for
+      multi-process runs and tests without Postgres;
+    - local: handed to this process's handlers right after commit (the
+      default on any other database).
+    """
+
+    def __init__(self, reconnect_delay=2):
+        self.reconnect_delay = reconnect_delay
+        self.backend = 'local'
+        self._handlers = defaultdict(list)
+        self._lock = threading.Lock()
+        self._engine = None
+        self._transport = None
+        self._listener_pid = None
+
+    def init_app(self, app, db):
+        with app.app_context():
+            self._engine = db.engine
+        backend = app.config['PUBSUB_BACKEND']
+        if backend == 'auto':
+            backend = 'postgres' if self._engine.dialect.name == 'postgresql' else 'local'
+        if backend not in ('postgres', 'unix', 'local'):
+            raise ValueError(f"Unknown PUBSUB_BACKEND '{backend}'")
+        self.backend = backend
+        if backend == 'unix':
+            self._transport = UnixSocketTransport(app.config['PUBSUB_SOCKET_DIR'])
+        if not event.contains(Session, 'before_commit', self._before_commit):
+            event.listen(Session, 'before_commit', self._before_commit)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+
+    @property
+    def uses_postgres(self):
+        return self.backend == 'postgres'
+
+    def add_handler(self, channel, handler):
+        """Call `handler(payload)` for every message committed on `channel`, from any worker."""
+        with self._lock:
+            self._handlers[channel].append(handler)
+
+    def publish(self, session, channel, payload):
+        session.info.setdefault(PENDING_KEY, []).append((channel, json.dumps(payload)))
+
+    def _before_commit(self, session):
+        if not self.uses_postgres:
+            return
+        for channel, data in session.info.pop(PENDING_KEY, []):
+            session.execute(sql_select(func.pg_notify(channel, data)))
+
+    def _after_commit(self, session):
+        for channel, data in session.info.pop(PENDING_KEY, []):
+            if self.backend == 'unix':
+                self._transport.send(channel, data)
+            else:
+                self._dispatch(channel, data)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(PENDING_KEY, None)
+
+    def _dispatch(self, channel, data):
+        payload = json.loads(data)
+        for handler in list(self._handlers.get(channel, ())):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception('pubsub handler for %s failed', channel)
+
+    def ensure_listening(self):
+        """Start this process's listener thread if it is not running yet.
+
+        Safe to call on every request; it only does work once per process, so
+        a thread started in a gunicorn master is replaced after fork. Handlers
+        run in the listener under an app context, so they can use the database.
+        """
+        if self.backend == 'local' or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            app = current_app._get_current_object()
+            threading.Thread(target=self._listen, args=(app,), name='pubsub-listener', daemon=True).start()
+
+    def _listen(self, app):
+        with app.app_context():
+            self._listen_forever()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                if self.backend == 'unix':
+                    self._transport.listen(self._dispatch)
+                else:
+                    self._listen_once()
+            except Exception:
+                logger.exception('pubsub listener failed, restarting')
+                time.sleep(self.reconnect_delay)
+
+    def _listen_once(self):
+        """Receive NOTIFYs on a dedicated PostgreSQL connection until it fails."""
+        connection = self._engine.raw_connection()
+        # a permanent LISTEN connection should not hold one of the pool's slots
+        connection.detach()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                for channel in list(self._handlers):
+                    cursor.execute(f'LISTEN "{channel}"')
+            while True:
+                # select() rather than a blocking read, so gevent workers can switch away
+                if select.select([dbapi_connection], [], [], 30) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    self._dispatch(notify.channel, notify.payload)
+        finally:
+            connection.close()
+
+
+INVALIDATIONS_KEY = 'pubsub_invalidations'
+
+
+class InvalidationBus:
+    """Broadcasts the cache keys a transaction touched to every worker once it commits.
+
+    Writers call touch(session, entity, id) (or id=None for "every row of
+    that entity") as part of the transaction. On commit the keys are applied
+    to this process's caches straight away, so a worker reads its own writes,
+    and published on `channel` for the others; on rollback they are dropped.
+    Handlers registered with on() receive the entity id, or None.
+    """
+
+    def __init__(self, pubsub, channel='cache_invalidations'):
+        self.pubsub = pubsub
+        self.channel = channel
+        self._handlers = defaultdict(list)
+        pubsub.add_handler(channel, self._apply_payload)
+        if not event.contains(Session, 'before_commit', self._before_commit):
+            # ahead of PubSub's own hook, so the publish below goes out in this commit
+            event.listen(Session, 'before_commit', self._before_commit, insert=True)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_soft_rollback', self._after_rollback)
+
+    def on(self, entity, handler):
+        self._handlers[entity].append(handler)
+
+    def touch(self, session, entity, entity_id=None):
+        session.info.setdefault(INVALIDATIONS_KEY, set()).add((entity, entity_id))
+
+    def _before_commit(self, session):
+        keys = session.info.get(INVALIDATIONS_KEY)
+        if keys:
+            self.pubsub.publish(session, self.channel, {'keys': [list(key) for key in keys]})
+
+    def _after_commit(self, session):
+        for entity, entity_id in session.info.pop(INVALIDATIONS_KEY, ()):
+            self._apply(entity, entity_id)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop(INVALIDATIONS_KEY, None)
+
+    def _apply_payload(self, payload):
+        for entity, entity_id in payload['keys']:
+            self._apply(entity, entity_id)
+
+    def _apply(self, entity, entity_id):
+        for handler in self._handlers.get(entity, ()):
+            handler(entity_id)
+
+
+class Subscribers:
+    """Per-topic fan-out of messages to bounded per-client queues."""
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._queues = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic):
+        subscriber = queue.Queue(maxsize=self.maxsize)
+        with self._lock:
+            self._queues[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, topic, subscriber):
+        with self._lock:
+            self._queues[topic].discard(subscriber)
+            if not self._queues[topic]:
+                del self._queues[topic]
+
+    def broadcast(self, topic, message):
+        with self._lock:
+            subscribers = list(self._queues.get(topic, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # a client that stopped reading must not hold up the others
+                logger.warning('dropping message for a slow subscriber on %s', topic)
+
+    def count(self, topic=None):
+        with self._lock:
+            if topic is not None:
+                return len(self._queues.get(topic, ()))
+            return sum(len(subscribers) for subscribers in self._queues.values())
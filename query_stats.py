@@ -0,0 +1,121 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('query_stats', default=None)
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|%s))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """`statement` with literals and IN-lists collapsed, so repeats with different values match."""
+    statement = _LITERALS.sub('?', statement)
+    statement = _IN_LISTS.sub('(...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class QueryStats:
+    """Statements executed, and the time spent in them, while this object is current.
+
+    Counts also roll up into `parent`, so a capture() around a test client
+    call sees the statements of the request it made.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            stats.fingerprints[fingerprint(statement)] += 1
+            stats = stats.parent
+
+    def repeated(self, threshold):
+        """Fingerprints executed at least `threshold` times: likely N+1 queries."""
+        return [(statement, count) for statement, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class QueryCounter:
+    """Counts SQL statements and database time per request.
+
+    With QUERY_STATS_HEADERS on, responses carry them in a Server-Timing
+    header (`db;desc="N queries";dur=ms`). Any statement fingerprint repeated
+    NPLUSONE_THRESHOLD times or more within one request is logged as an N+1
+    candidate.
+    """
+
+    def init_app(self, app, db):
+        self.headers = app.config['QUERY_STATS_HEADERS']
+        self.threshold = app.config['NPLUSONE_THRESHOLD']
+        with app.app_context():
+            engine = db.engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    @contextmanager
+    def capture(self):
+        """Collect every statement run in this context, including by requests made through a test client.
+
+            with query_counter.capture() as queries:
+                client.get('/projects')
+            assert queries.count <= 2
+        """
+        stats = QueryStats(parent=_current.get())
+        token = _current.set(stats)
+        try:
+            yield stats
+        finally:
+            _current.reset(token)
+
+    def _before_request(self):
+        g.query_stats = QueryStats(parent=_current.get())
+        g.query_stats_token = _current.set(g.query_stats)
+        g.query_stats_started = time.perf_counter()
+
+    def _after_request(self, response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        for statement, count in stats.repeated(self.threshold):
+            logger.warning('possible N+1 in %s %s: %d x %s', request.method, request.path, count, statement)
+        if self.headers:
+            total = (time.perf_counter() - g.query_stats_started) * 1000
+            response.headers.add(
+                'Server-Timing', f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}, app;dur={total:.1f}'
+            )
+        return response
+
+    def _teardown_request(self, exc):
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # on the execution context rather than the connection, so a failed statement leaves nothing behind
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - context.query_started)
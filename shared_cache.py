@@ -0,0 +1,125 @@
+import fcntl
+import hashlib
+import mmap
+import struct
+import tempfile
+import threading
+import time
+
+# Per-slot header: key digest, expiry, last use, etag length, body length.
+SLOT_HEADER = struct.Struct('<16sddHI')
+GENERATION = struct.Struct('<Q')
+GENERATION_COUNT = 4096
+WAYS = 8
+
+
+def _digest(key):
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+class SharedResponseCache:
+    """Pre-encoded responses and their ETags, shared by every worker forked from one master.
+
+    Backed by an anonymous MAP_SHARED mmap, so it is only shared when it is
+    configured before gunicorn forks (preload_app); otherwise each worker has
+    its own. Memory is `slots` fixed-size slots in sets of WAYS, evicting the
+    least recently used slot of a set. Keys are versioned: bump(namespace)
+    advances a shared generation counter, which orphans every entry built
+    under the old one. A POSIX lock, released by the kernel if its holder
+    dies, serialises the workers.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.hits = 0
+        self.misses = 0
+        self._map = None
+
+    def configure(self, slots=256, slot_size=128 * 1024, ttl=300):
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self.sets = max(1, slots // WAYS)
+        self.capacity = slot_size - SLOT_HEADER.size
+        self._slots_offset = GENERATION_COUNT * GENERATION.size
+        self._map = mmap.mmap(-1, self._slots_offset + self.sets * WAYS * slot_size,
+                              flags=mmap.MAP_SHARED, prot=mmap.PROT_READ | mmap.PROT_WRITE)
+        self._lock_file = tempfile.TemporaryFile()
+        self._thread_lock = threading.Lock()
+        self.enabled = slots > 0
+
+    def _locked(self):
+        return _CacheLock(self._thread_lock, self._lock_file.fileno())
+
+    def _generation_offset(self, namespace):
+        return int.from_bytes(_digest(namespace)[:4], 'little') % GENERATION_COUNT * GENERATION.size
+
+    def generation(self, namespace):
+        with self._locked():
+            return GENERATION.unpack_from(self._map, self._generation_offset(namespace))[0]
+
+    def bump(self, namespace):
+        if not self.enabled:
+            return
+        offset = self._generation_offset(namespace)
+        with self._locked():
+            GENERATION.pack_into(self._map, offset, GENERATION.unpack_from(self._map, offset)[0] + 1)
+
+    def _set_offsets(self, digest):
+        index = int.from_bytes(digest[4:12], 'little') % self.sets
+        base = self._slots_offset + index * WAYS * self.slot_size
+        return [base + way * self.slot_size for way in range(WAYS)]
+
+    def get(self, key):
+        """Return (etag, body) for `key`, or None."""
+        digest = _digest(key)
+        now = time.time()
+        with self._locked():
+            for offset in self._set_offsets(digest):
+                slot_key, expires_at, _, etag_len, body_len = SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_key == digest and expires_at > now:
+                    SLOT_HEADER.pack_into(self._map, offset, slot_key, expires_at, now, etag_len, body_len)
+                    start = offset + SLOT_HEADER.size
+                    etag = self._map[start:start + etag_len].decode('utf-8')
+                    body = self._map[start + etag_len:start + etag_len + body_len]
+                    self.hits += 1
+                    return etag, body
+        self.misses += 1
+        return None
+
+    def set(self, key, etag, body):
+        etag_bytes = etag.encode('utf-8')
+        if len(etag_bytes) + len(body) > self.capacity:
+            return False
+        digest = _digest(key)
+        now = time.time()
+        with self._locked():
+            victim, victim_used = None, None
+            for offset in self._set_offsets(digest):
+                slot_key, expires_at, last_used, _, _ = SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_key == digest or expires_at <= now:
+                    victim = offset
+                    break
+                if victim is None or last_used < victim_used:
+                    victim, victim_used = offset, last_used
+            SLOT_HEADER.pack_into(self._map, victim, digest, now + self.ttl, now, len(etag_bytes), len(body))
+            start = victim + SLOT_HEADER.size
+            self._map[start:start + len(etag_bytes)] = etag_bytes
+            self._map[start + len(etag_bytes):start + len(etag_bytes) + len(body)] = body
+        return True
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': len(self._map) if self._map else 0}
+
+
+class _CacheLock:
+    def __init__(self, thread_lock, fd):
+        self.thread_lock = thread_lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.lockf(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
@@ -0,0 +1,169 @@
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app, has_request_context, request
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from query_stats import fingerprint
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ('select', 'with')
+
+
+def redact(parameters):
+    """Bound parameters with strings and bytes replaced by their length; numbers, bools and None are kept."""
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact(value) for value in parameters]
+    if parameters is None or isinstance(parameters, (bool, int, float)):
+        return parameters
+    if isinstance(parameters, (str, bytes)):
+        return f'<{type(parameters).__name__}:{len(parameters)}>'
+    return f'<{type(parameters).__name__}>'
+
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_MS, kept in a ring buffer of SLOW_QUERY_BUFFER entries.
+
+    Each entry holds the statement fingerprint, its redacted parameters, the
+    duration and the route that ran it. On PostgreSQL a SLOW_QUERY_EXPLAIN_RATE
+    share of slow SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) on a
+    background thread, and the plan is attached to the entry. The buffer is
+    also written to SLOW_QUERY_DIR, one file per process, so that
+    `flask slow-queries` can rank the offenders of every worker.
+    """
+
+    def __init__(self):
+        self.entries = deque()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._write_pending = False
+
+    def init_app(self, app, db):
+        self.threshold = app.config['SLOW_QUERY_MS'] / 1000
+        self.explain_rate = app.config['SLOW_QUERY_EXPLAIN_RATE']
+        self.directory = app.config['SLOW_QUERY_DIR']
+        self.entries = deque(maxlen=app.config['SLOW_QUERY_BUFFER'])
+        with app.app_context():
+            self._engine = db.engine
+        if self.threshold > 0 and not event.contains(self._engine, 'after_cursor_execute', self._after_cursor_execute):
+            event.listen(self._engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(self._engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.cli.add_command(slow_queries_command)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.slow_query_started
+        if duration < self.threshold or context.execution_options.get('slow_query_explain'):
+            return
+        entry = {
+            'fingerprint': fingerprint(statement),
+            'parameters': f'<{len(parameters)} rows>' if executemany else redact(parameters),
+            'duration_ms': round(duration * 1000, 1),
+            'route': f'{request.method} {request.url_rule.rule if request.url_rule else request.path}' if has_request_context() else None,
+            'at': time.time(),
+            'plan': None,
+        }
+        with self._lock:
+            self.entries.append(entry)
+        logger.warning('slow query (%.1f ms) in %s: %s', entry['duration_ms'], entry['route'], entry['fingerprint'])
+        if (self._engine.dialect.name == 'postgresql' and statement.lstrip()[:6].lower().startswith(EXPLAINABLE)
+                and random.random() < self.explain_rate):
+            # the real parameters are needed to reproduce the plan; they never leave this process
+            self._submit(self._explain, entry, statement, parameters)
+        self._schedule_write()
+
+    def _submit(self, fn, *args):
+        if self._executor_pid != os.getpid():
+            # a pool inherited over fork has no threads behind it
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-queries')
+            self._executor_pid = os.getpid()
+        self._executor.submit(fn, *args)
+
+    def _explain(self, entry, statement, parameters):
+        try:
+            with self._engine.connect().execution_options(slow_query_explain=True) as conn:
+                rows = conn.exec_driver_sql(f'EXPLAIN (ANALYZE, BUFFERS) {statement}', parameters).all()
+                # ANALYZE runs the statement; nothing it did is kept
+                conn.rollback()
+            entry['plan'] = '\n'.join(row[0] for row in rows)
+        except Exception:
+            logger.exception('EXPLAIN of a slow query failed')
+        self._schedule_write()
+
+    def _schedule_write(self):
+        with self._lock:
+            if self._write_pending:
+                return
+            self._write_pending = True
+        self._submit(self._write)
+
+    def _write(self):
+        with self._lock:
+            self._write_pending = False
+            entries = list(self.entries)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getpid()}.json')
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(entries, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            logger.exception('writing the slow query log failed')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.slow_query_started = time.perf_counter()
+
+
+def top_offenders(directory, order_by='total', limit=20):
+    """Slow query entries from every process's file in `directory`, grouped by fingerprint."""
+    groups = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for entry in entries:
+            group = groups.setdefault(entry['fingerprint'], {
+                'fingerprint': entry['fingerprint'], 'count': 0, 'total': 0.0, 'max': 0.0, 'routes': set(), 'plan': None,
+            })
+            group['count'] += 1
+            group['total'] += entry['duration_ms']
+            group['max'] = max(group['max'], entry['duration_ms'])
+            if entry['route']:
+                group['routes'].add(entry['route'])
+            group['plan'] = entry['plan'] or group['plan']
+    return sorted(groups.values(), key=lambda group: group[order_by], reverse=True)[:limit]
+
+
+@click.command('slow-queries')
+@click.option('--by', 'order_by', type=click.Choice(['total', 'max', 'count']), default='total', show_default=True)
+@click.option('--limit', default=20, show_default=True)
+@click.option('--plans', is_flag=True, help='Print the captured EXPLAIN plans too.')
+@with_appcontext
+def slow_queries_command(order_by, limit, plans):
+    """List the slowest statements recorded by every worker."""
+    offenders = top_offenders(current_app.config['SLOW_QUERY_DIR'], order_by, limit)
+    if not offenders:
+        click.echo('No slow queries recorded.')
+    for group in offenders:
+        click.echo(
+            f"{group['count']:>6} x  total {group['total']:>10.1f} ms  max {group['max']:>8.1f} ms  "
+            f"mean {group['total'] / group['count']:>8.1f} ms  {', '.join(sorted(group['routes'])) or '-'}"
+        )
+        click.echo(f"    {group['fingerprint']}")
+        if plans and group['plan']:
+            click.echo('\n'.join(f'        {line}' for line in group['plan'].splitlines()))
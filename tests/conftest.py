@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+os.environ.setdefault('JWT_SECRET', 'test-secret-that-is-long-enough-for-hs256')
+
+import app as weldon  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """A TestConfig app on a fresh in-memory SQLite database."""
+    app = weldon.create_app('test')
+    with app.app_context():
+        weldon.db.create_all()
+        yield app
+        weldon.db.session.remove()
+    weldon.project_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """Three users, six projects spread over them and a dozen comments on two of the projects."""
+    db = weldon.db
+    users = [weldon.User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(3)]
+    db.session.add_all(users)
+    db.session.flush()
+    projects = [weldon.Project(title=f'Project {i}', user_id=users[i % 3].id) for i in range(6)]
+    db.session.add_all(projects)
+    db.session.flush()
+    comments = [
+        weldon.Comment(content=f'Comment {i}', user_id=users[i % 3].id, project_id=projects[i % 2].id)
+        for i in range(12)
+    ]
+    db.session.add_all(comments)
+    db.session.commit()
+    return {'users': users, 'projects': projects, 'comments': comments}
@@ -0,0 +1,117 @@
+"""TTLCache.get_or_load: coalesced misses and invalidation during a load."""
+import threading
+import time
+
+import pytest
+
+import cache as cache_module
+from cache import TTLCache
+
+THREADS = 8
+TIMEOUT = 5
+
+
+def blocking_loader(release, value='loaded'):
+    """A loader that counts its calls and waits for `release` before returning."""
+    calls = []
+
+    def load():
+        calls.append(threading.get_ident())
+        assert release.wait(TIMEOUT)
+        return value
+
+    return load, calls
+
+
+def in_threads(fn, count):
+    results, errors = [None] * count, [None] * count
+
+    def run(index):
+        try:
+            results[index] = fn()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+@pytest.fixture
+def waiting(monkeypatch):
+    """Ids of the threads that blocked waiting on another thread's load."""
+    waiters = []
+
+    class CountedEvent(threading.Event):
+        def wait(self, timeout=None):
+            waiters.append(threading.get_ident())
+            return super().wait(timeout)
+
+    class CountedCall(cache_module._Call):
+        def __init__(self):
+            super().__init__()
+            self.done = CountedEvent()
+
+    monkeypatch.setattr(cache_module, '_Call', CountedCall)
+    return waiters
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_concurrent_misses_run_the_loader_once(waiting):
+    cache, release = TTLCache(), threading.Event()
+    load, calls = blocking_loader(release)
+
+    threads, results, errors = in_threads(lambda: cache.get_or_load('key', load), THREADS)
+    # one thread is loading and every other one is waiting on it
+    wait_for(lambda: len(waiting) == THREADS - 1)
+    release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert len(calls) == 1
+    assert results == ['loaded'] * THREADS
+    assert errors == [None] * THREADS
+    assert cache.get('key') == 'loaded'
+
+
+def test_waiters_get_the_loaders_exception_and_nothing_is_cached(waiting):
+    cache, release = TTLCache(), threading.Event()
+
+    def load():
+        assert release.wait(TIMEOUT)
+        raise LookupError('database down')
+
+    threads, results, errors = in_threads(lambda: cache.get_or_load('key', load), THREADS)
+    wait_for(lambda: len(waiting) == THREADS - 1)
+    release.set()
+    for thread in threads:
+        thread.join(TIMEOUT)
+
+    assert all(isinstance(error, LookupError) for error in errors)
+    assert cache.get('key') is None
+
+
+@pytest.mark.parametrize('invalidate', [
+    lambda cache: cache.invalidate('key'),
+    lambda cache: cache.clear(),
+])
+def test_result_invalidated_while_loading_is_returned_but_not_stored(invalidate):
+    cache, release = TTLCache(), threading.Event()
+    load, calls = blocking_loader(release, value='stale')
+
+    threads, results, _ = in_threads(lambda: cache.get_or_load('key', load), 1)
+    wait_for(lambda: calls)
+    invalidate(cache)
+    release.set()
+    threads[0].join(TIMEOUT)
+
+    assert results == ['stale']
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: 'fresh') == 'fresh'
@@ -0,0 +1,108 @@
+"""GET /changes: the (txid, id) cursor, folding to the latest op per row, and tombstones."""
+import pytest
+
+from app import encode_cursor
+
+
+def changes(client, **params):
+    response = client.get('/changes', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def walk(client, limit, since=None):
+    """Every page from `since` on, following next_cursor until has_more is false."""
+    pages = []
+    while True:
+        params = {'limit': limit, **({'since': since} if since else {})}
+        page = changes(client, **params)
+        pages.append(page)
+        since = page['next_cursor']
+        if not page['has_more']:
+            return pages
+
+
+@pytest.fixture
+def project_lifecycle(client, seed):
+    """Create, rename and delete one project through the API; returns its id."""
+    created = client.post('/projects', json={'title': 'New', 'user_id': seed['users'][0].id}).get_json()
+    client.patch(f"/projects/{created['id']}", json={'title': 'Renamed'})
+    client.delete(f"/projects/{created['id']}")
+    return created['id']
+
+
+def test_a_page_folds_each_row_to_its_latest_op(client, project_lifecycle):
+    page = changes(client)
+
+    assert page['projects'] == []
+    assert page['deleted']['projects'] == [project_lifecycle]
+    assert page['has_more'] is False
+
+
+def test_upsert_of_a_row_deleted_since_comes_back_as_a_tombstone(client, project_lifecycle):
+    pages = walk(client, limit=1)
+
+    assert [page['has_more'] for page in pages] == [True, True, False]
+    assert all(page['projects'] == [] for page in pages)
+    assert all(page['deleted']['projects'] == [project_lifecycle] for page in pages)
+
+
+def test_updates_come_back_as_the_current_row(client, seed):
+    user = seed['users'][0]
+    created = client.post('/projects', json={'title': 'New', 'user_id': user.id}).get_json()
+    client.patch(f"/projects/{created['id']}", json={'title': 'Renamed'})
+
+    pages = walk(client, limit=1)
+
+    assert len(pages) == 2
+    assert [page['projects'][0]['title'] for page in pages] == ['Renamed', 'Renamed']
+
+
+def test_the_last_cursor_is_stable_until_something_changes(client, project_lifecycle, seed):
+    cursor = walk(client, limit=1)[-1]['next_cursor']
+
+    idle = changes(client, since=cursor)
+    assert (idle['next_cursor'], idle['has_more'], idle['deleted']['projects']) == (cursor, False, [])
+
+    client.patch(f"/users/{seed['users'][1].id}", json={'github': 'https://github.com/user1'})
+    later = changes(client, since=cursor)
+    assert [user['id'] for user in later['users']] == [seed['users'][1].id]
+    assert later['next_cursor'] != cursor
+
+
+def test_cursor_from_before_txids_is_read_as_a_bare_id(client, seed):
+    users = seed['users']
+    for user in users:
+        client.patch(f'/users/{user.id}', json={'github': f'https://github.com/{user.username}'})
+    first = changes(client, limit=1)
+
+    # a cursor issued before the txid column held only the change log id
+    legacy = changes(client, since=encode_cursor(1))
+
+    assert [user['id'] for user in first['users']] == [users[0].id]
+    assert [user['id'] for user in legacy['users']] == [user.id for user in users[1:]]
+
+
+def test_deleting_a_user_logs_tombstones_for_cascaded_rows(client, seed):
+    user = seed['users'][0]
+    projects = [project.id for project in seed['projects'] if project.user_id == user.id]
+    comments = sorted(
+        comment.id for comment in seed['comments'] if comment.user_id == user.id or comment.project_id in projects
+    )
+
+    assert client.delete(f'/users/{user.id}').status_code == 200
+    page = changes(client)
+
+    assert page['deleted'] == {'users': [user.id], 'projects': sorted(projects), 'comments': comments}
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'since': '!!not-a-cursor'}, 'Invalid cursor'),
+    ({'since': encode_cursor('x:y')}, 'Invalid cursor'),
+    ({'limit': 'x'}, 'Invalid limit'),
+])
+def test_bad_arguments_are_rejected(client, params, error):
+    response = client.get('/changes', query_string=params)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
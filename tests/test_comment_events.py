@@ -0,0 +1,51 @@
+"""Comment events reach SSE subscribers without putting the comment in the NOTIFY payload."""
+import json
+
+import pytest
+
+import app as weldon
+
+
+@pytest.fixture
+def subscriber(seed):
+    project_id = seed['projects'][0].id
+    subscriber = weldon.comment_subscribers.subscribe(project_id)
+    yield subscriber
+    weldon.comment_subscribers.unsubscribe(project_id, subscriber)
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+    publish = weldon.pubsub.publish
+
+    def record(session, channel, payload):
+        messages.append(json.dumps(payload))
+        publish(session, channel, payload)
+
+    monkeypatch.setattr(weldon.pubsub, 'publish', record)
+    return messages
+
+
+def test_long_comment_is_broadcast_but_not_notified(client, seed, subscriber, published):
+    content = 'x' * 20000
+    project_id = seed['projects'][0].id
+
+    response = client.post('/comments', json={'content': content, 'user_id': seed['users'][0].id, 'project_id': project_id})
+
+    assert response.status_code == 201
+    assert all(len(message.encode('utf-8')) < 8000 for message in published)
+    event = subscriber.get_nowait()
+    assert event['type'] == 'created'
+    assert event['comment']['content'] == content
+
+
+def test_update_and_delete_events(client, seed, subscriber):
+    comment = seed['comments'][0]
+
+    client.patch(f'/comments/{comment.id}', json={'content': 'edited'})
+    client.delete(f'/comments/{comment.id}')
+
+    updated, deleted = subscriber.get_nowait(), subscriber.get_nowait()
+    assert (updated['type'], updated['comment']['content']) == ('updated', 'edited')
+    assert deleted == {'type': 'deleted', 'comment': {'id': comment.id, 'project_id': comment.project_id}}
@@ -0,0 +1,25 @@
+"""If-None-Match handling on the read endpoints."""
+import pytest
+
+
+@pytest.fixture
+def project_url(seed):
+    return f"/projects/{seed['projects'][0].id}"
+
+
+def test_matching_etag_is_not_modified(client, project_url):
+    etag = client.get(project_url).headers['ETag']
+
+    assert client.get(project_url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_weakened_etag_still_matches(client, project_url):
+    etag = client.get(project_url).headers['ETag']
+
+    # what a proxy that gzips the body sends back
+    assert client.get(project_url, headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+
+
+def test_star_matches_and_stale_etag_does_not(client, project_url):
+    assert client.get(project_url, headers={'If-None-Match': '*'}).status_code == 304
+    assert client.get(project_url, headers={'If-None-Match': '"stale"'}).status_code == 200
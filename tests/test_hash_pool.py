@@ -0,0 +1,35 @@
+"""A saturated password hashing pool fails fast with 503 and Retry-After."""
+import pytest
+
+from app import password_hasher
+
+
+@pytest.fixture
+def saturated():
+    """Hold every admission slot of the hashing pool, as that many slow logins would."""
+    capacity = password_hasher.stats()['capacity']
+    for _ in range(capacity):
+        assert password_hasher._slots.acquire(blocking=False)
+    yield
+    for _ in range(capacity):
+        password_hasher._slots.release()
+
+
+def test_signin_on_a_saturated_pool_is_503_with_retry_after(app, client, seed, saturated):
+    user = seed['users'][0]
+    rejected = password_hasher.stats()['rejected_total']
+
+    response = client.post('/signin', json={'username': user.username, 'password': 'hunter22'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(app.config['HASH_POOL_RETRY_AFTER'])
+    assert password_hasher.stats()['rejected_total'] == rejected + 1
+
+
+def test_signin_works_again_once_slots_free_up(client, seed):
+    user = seed['users'][0]
+    client.patch(f'/users/{user.id}', json={'password': 'hunter22'})
+
+    response = client.post('/signin', json={'username': user.username, 'password': 'hunter22'})
+
+    assert response.status_code == 200
@@ -0,0 +1,104 @@
+"""Cache invalidations cross processes over PUBSUB_BACKEND=unix, and only once committed.
+
+Each side runs in its own spawned process, since the backend is picked from
+the environment when config is imported.
+"""
+import multiprocessing
+import os
+import socket
+import time
+
+import pytest
+
+TIMEOUT = 10
+
+
+def _start(env):
+    os.environ.update(env)
+    import app as weldon
+    app = weldon.create_app('test')
+    return weldon, app
+
+
+def reader(env, ready, results):
+    """Listen, fill the caches for user 1 and project 1, then report what gets evicted."""
+    weldon, app = _start(env)
+    with app.test_request_context():
+        weldon.pubsub.ensure_listening()
+    socket_path = os.path.join(env['PUBSUB_SOCKET_DIR'], f'{os.getpid()}.sock')
+    deadline = time.monotonic() + TIMEOUT
+    while not os.path.exists(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    weldon.project_cache.set(1, 'cached')
+    weldon.identity_cache.set(1, 'cached')
+    ready.set()
+
+    # the writer's last step touches user 1; everything it published before has arrived by then
+    deadline = time.monotonic() + TIMEOUT
+    while weldon.identity_cache.get(1) is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    results.put({
+        'identity_evicted': weldon.identity_cache.get(1) is None,
+        'project_evicted': weldon.project_cache.get(1) is None,
+    })
+
+
+def writer(env, ready, update_project):
+    weldon, app = _start(env)
+    with app.app_context():
+        db = weldon.db
+        db.create_all()
+        user = weldon.User(username='user', email='user@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(weldon.Project(title='Project', user_id=user.id))
+        db.session.commit()
+    ready.wait(TIMEOUT)
+
+    if update_project:
+        client = app.test_client()
+        assert client.patch('/projects/1', json={'title': 'Renamed'}).status_code == 200
+        assert client.patch('/users/1', json={'github': 'https://github.com/user'}).status_code == 200
+        return
+    # the same session rolls back a project write, then commits a user write
+    with app.app_context():
+        weldon.record_change(weldon.Project.__tablename__, 1, weldon.ChangeLog.UPSERT)
+        weldon.db.session.rollback()
+        weldon.record_change(weldon.User.__tablename__, 1, weldon.ChangeLog.UPSERT)
+        weldon.db.session.commit()
+
+
+def run(tmp_path, update_project):
+    env = {
+        'PUBSUB_BACKEND': 'unix',
+        'PUBSUB_SOCKET_DIR': str(tmp_path / 'sockets'),
+        'TEST_DATABASE_URL': f"sqlite:///{tmp_path / 'app.db'}",
+    }
+    context = multiprocessing.get_context('spawn')
+    ready, results = context.Event(), context.Queue()
+    processes = [
+        context.Process(target=reader, args=(env, ready, results)),
+        context.Process(target=writer, args=(env, ready, update_project)),
+    ]
+    for process in processes:
+        process.start()
+    try:
+        outcome = results.get(timeout=TIMEOUT * 2)
+    finally:
+        for process in processes:
+            process.join(TIMEOUT)
+            if process.is_alive():
+                process.kill()
+    assert [process.exitcode for process in processes] == [0, 0]
+    return outcome
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs UNIX domain sockets')
+def test_write_in_one_process_evicts_the_other_processes_caches(tmp_path):
+    assert run(tmp_path, update_project=True) == {'identity_evicted': True, 'project_evicted': True}
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='needs UNIX domain sockets')
+def test_rolled_back_write_publishes_nothing(tmp_path):
+    assert run(tmp_path, update_project=False) == {'identity_evicted': True, 'project_evicted': False}
@@ -0,0 +1,59 @@
+"""The keyset pagination contract of the list endpoints: `limit`, `after` and `next_cursor`."""
+import pytest
+
+from app import encode_cursor
+
+
+def walk(client, url, limit):
+    """Every page of `url`, following next_cursor until it is null."""
+    pages, after = [], None
+    while True:
+        params = {'limit': limit, **({'after': after} if after else {})}
+        response = client.get(url, query_string=params)
+        assert response.status_code == 200, response.get_json()
+        page = response.get_json()
+        pages.append(page)
+        after = page['next_cursor']
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize('url, key', [('/comments', 'comments'), ('/projects', 'projects'), ('/users', 'users')])
+@pytest.mark.parametrize('limit', [1, 5, 12, 50])
+def test_walking_next_cursor_returns_every_row_once_in_order(client, seed, url, key, limit):
+    expected = sorted(row.id for row in seed[key])
+
+    pages = walk(client, url, limit)
+
+    ids = [item['id'] for page in pages for item in page['items']]
+    assert ids == expected
+    assert all(len(page['items']) <= limit for page in pages)
+    # limit + 1 rows are read, so an exactly full last page already has no next_cursor
+    assert len(pages) == max(1, -(-len(expected) // limit))
+
+
+def test_limit_is_clamped_to_max_page_size(app, client, seed):
+    app.config['MAX_PAGE_SIZE'] = 5
+
+    page = client.get('/comments', query_string={'limit': 1000}).get_json()
+
+    assert len(page['items']) == 5
+    assert page['next_cursor'] == encode_cursor(page['items'][-1]['id'])
+
+
+def test_limit_below_one_returns_one_row(client, seed):
+    page = client.get('/comments', query_string={'limit': 0}).get_json()
+
+    assert len(page['items']) == 1
+
+
+@pytest.mark.parametrize('params, error', [
+    ({'after': '!!not-a-cursor'}, 'Invalid cursor'),
+    ({'after': encode_cursor('abc')}, 'Invalid cursor'),
+    ({'limit': 'ten'}, 'Invalid limit'),
+])
+def test_bad_arguments_are_rejected(client, seed, params, error):
+    response = client.get('/comments', query_string=params)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
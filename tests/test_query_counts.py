@@ -0,0 +1,36 @@
+"""Statements run per request on the read endpoints.
+
+Each page is seeded with several rows owned by different users, so a
+per-row lazy load would show up here as extra statements.
+"""
+import pytest
+
+from app import query_counter
+
+
+def statements(client, url):
+    with query_counter.capture() as queries:
+        response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return queries.count
+
+
+@pytest.mark.parametrize('url', ['/projects', '/users', '/comments'])
+def test_list_is_one_statement(client, seed, url):
+    assert statements(client, url) == 1
+
+
+def test_project_detail_is_one_statement(client, seed):
+    project = seed['projects'][0]
+    assert statements(client, f'/projects/{project.id}') == 1
+
+
+def test_project_comments_checks_the_project_then_reads_one_page(client, seed):
+    project = seed['projects'][0]
+    assert statements(client, f'/projects/{project.id}/comments') == 2
+
+
+def test_project_detail_is_served_from_cache(client, seed):
+    url = f"/projects/{seed['projects'][0].id}"
+    statements(client, url)
+    assert statements(client, url) == 0
@@ -0,0 +1,42 @@
+"""GET /users/<id> bodies in the shared cache are invalidated per user."""
+from app import query_counter
+
+
+def get(client, url):
+    with query_counter.capture() as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.get_json(), queries.count
+
+
+def test_a_user_write_only_evicts_that_user(client, seed):
+    first, second = seed['users'][:2]
+    for user in (first, second):
+        get(client, f'/users/{user.id}')
+
+    client.patch(f'/users/{second.id}', json={'github': 'https://github.com/renamed'})
+
+    _, first_queries = get(client, f'/users/{first.id}')
+    body, second_queries = get(client, f'/users/{second.id}')
+    assert first_queries == 0
+    assert second_queries == 1
+    assert body['github'] == 'https://github.com/renamed'
+
+
+def test_a_signup_leaves_cached_users_alone(client, seed):
+    user = seed['users'][0]
+    get(client, f'/users/{user.id}')
+
+    client.post('/signup', json={'username': 'newcomer', 'email': 'new@example.com', 'password': 'hunter22'})
+
+    assert get(client, f'/users/{user.id}')[1] == 0
+
+
+def test_a_project_write_evicts_the_project_pages(client, seed):
+    get(client, '/projects')
+
+    client.patch(f"/projects/{seed['projects'][0].id}", json={'title': 'Renamed'})
+
+    body, queries = get(client, '/projects')
+    assert queries == 1
+    assert body['items'][0]['title'] == 'Renamed'
@@ -0,0 +1,61 @@
+"""PUT accepts an object as it was read; PATCH rejects fields it cannot write."""
+
+import app as weldon
+
+
+def test_put_ignores_read_only_fields(client, seed):
+    project = client.get(f"/projects/{seed['projects'][0].id}").get_json()
+    project['title'] = 'Renamed'
+
+    response = client.put(f"/projects/{project['id']}", json=project)
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['project']['title'] == 'Renamed'
+
+
+def test_put_with_nothing_writable_leaves_the_row(client, seed):
+    comment = seed['comments'][0]
+
+    response = client.put(f'/comments/{comment.id}', json={'id': comment.id})
+
+    assert response.status_code == 200
+    assert response.get_json()['comment']['content'] == 'Comment 0'
+
+
+def test_patch_rejects_unknown_fields(client, seed):
+    project = seed['projects'][0]
+
+    response = client.patch(f'/projects/{project.id}', json={'title': 'Renamed', 'user_id': 99})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown fields: user_id'}
+
+
+def test_put_still_validates_writable_fields(client, seed):
+    user = seed['users'][0]
+
+    response = client.put(f'/users/{user.id}', json={'id': user.id, 'username': ''})
+
+    assert response.status_code == 400
+
+
+def test_password_hash_is_not_writable(client, seed):
+    user = seed['users'][0]
+
+    patched = client.patch(f'/users/{user.id}', json={'password_hash': 'plain'})
+    put = client.put(f'/users/{user.id}', json={'username': user.username, 'password_hash': 'plain'})
+
+    assert patched.status_code == 400
+    assert patched.get_json() == {'error': 'Unknown fields: password_hash'}
+    assert put.status_code == 200
+    assert weldon.db.session.get(weldon.User, user.id).password_hash == 'x'
+
+
+def test_password_is_hashed_before_it_is_stored(client, seed):
+    user = seed['users'][0]
+
+    response = client.patch(f'/users/{user.id}', json={'password': 'hunter22'})
+    signin = client.post('/signin', json={'username': user.username, 'password': 'hunter22'})
+
+    assert response.status_code == 200
+    assert signin.status_code == 200, signin.get_json()